@@ -6,7 +6,6 @@ import os
 import subprocess
 import socketio
 import sys
-import json 
 from dotenv import load_dotenv
 
 # Load environment variables from .env file in the root directory
@@ -38,6 +37,11 @@ script_dir = os.path.dirname(__file__)
 project_root = os.path.dirname(script_dir) # Go up one level from 'display'
 settings_file_path = os.path.join(project_root, 'web_UI', 'settings.json')
 print(f"Settings file path: {settings_file_path}")
+
+# Shared settings cache from web_UI: parses settings.json only when it changes
+sys.path.insert(0, os.path.join(project_root, 'web_UI'))
+from settings_cache import SettingsCache
+settings_cache = SettingsCache(settings_file_path)
 # --- End Settings File Path ---
 
 
@@ -91,24 +95,19 @@ def load_password_from_settings():
     global user_password, password_Set, current_screen
     try:
         if os.path.exists(settings_file_path):
-            with open(settings_file_path, 'r') as f:
-                settings_data = json.load(f)
-                loaded_password = settings_data.get("keypad_password")
-                if loaded_password and len(loaded_password) == 4:
-                    user_password = loaded_password
-                    password_Set = True
-                    print(f"Loaded password from settings: {user_password}")
-                    current_screen = "home" # Start at home if password exists
-                    return True
-                else:
-                    print("No valid password found in settings.json or password length is not 4.")
-                    current_screen = "set_password" # Force setup if invalid
+            loaded_password = settings_cache.get("keypad_password")
+            if loaded_password and len(loaded_password) == 4:
+                user_password = loaded_password
+                password_Set = True
+                print(f"Loaded password from settings: {user_password}")
+                current_screen = "home" # Start at home if password exists
+                return True
+            else:
+                print("No valid password found in settings.json or password length is not 4.")
+                current_screen = "set_password" # Force setup if invalid
         else:
             print(f"Settings file not found at {settings_file_path}. User needs to set a password.")
             current_screen = "set_password" # Force setup if file missing
-    except (json.JSONDecodeError, IOError) as e:
-        print(f"Error loading settings: {e}. User needs to set a password.")
-        current_screen = "set_password" # Force setup on error
     except Exception as e:
         print(f"An unexpected error occurred loading settings: {e}")
         current_screen = "set_password" # Force setup on unexpected error
@@ -119,24 +118,10 @@ def load_password_from_settings():
 
 def save_password_to_settings(new_password):
     """Saves the keypad password to settings.json."""
-    settings_data = {}
     try:
-        # Load existing settings first to avoid overwriting other keys
-        if os.path.exists(settings_file_path):
-            with open(settings_file_path, 'r') as f:
-                try:
-                    settings_data = json.load(f)
-                except json.JSONDecodeError:
-                    print("Warning: settings.json is corrupted. Creating a new one.")
-                    settings_data = {} # Start fresh if corrupted
-
-        settings_data["keypad_password"] = new_password
-
-        # Ensure the directory exists before writing
-        os.makedirs(os.path.dirname(settings_file_path), exist_ok=True)
-
-        with open(settings_file_path, 'w') as f:
-            json.dump(settings_data, f, indent=4)
+        # Merged into the latest settings under a lock shared with the web server,
+        # then written to a temp file and renamed over settings.json
+        settings_cache.update({"keypad_password": new_password})
         print(f"Password saved to {settings_file_path}")
         return True
     except (IOError, OSError) as e:
@@ -145,6 +130,17 @@ def save_password_to_settings(new_password):
     except Exception as e:
         print(f"An unexpected error occurred saving settings: {e}")
         return False
+
+def on_settings_changed(settings_data, changed_keys):
+    """Picks up a keypad password changed by another component (e.g. the web UI)."""
+    global user_password, password_Set
+    if "keypad_password" not in changed_keys:
+        return
+    new_password = settings_data.get("keypad_password")
+    if new_password and len(new_password) == 4 and new_password != user_password:
+        user_password = new_password
+        password_Set = True
+        print("Keypad password updated from settings.json")
 # --- End Password Persistence Functions ---
 
 
@@ -762,6 +758,8 @@ except Exception as e:
 
 # --- Load Password and Set Initial Screen ---
 load_password_from_settings()
+settings_cache.subscribe(on_settings_changed)
+settings_cache.start_watching()
 # --- End Load Password ---
 
 # Draw the initial screen based on whether password needs setting
@@ -13,7 +13,7 @@ import socket
 import logging
 import sys
 import os
-import subprocess
+import atexit
 from dotenv import load_dotenv 
 
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
@@ -32,6 +32,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ListenerPi")
 
+# The Pico link lives in web_UI, shared with the web server
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(project_root, 'web_UI'))
+from pico_link import PicoLink, PicoLinkError
+from mpy_compile import module_files
+
 # --- Configuration ---
 LISTENER_HOST = os.getenv('LISTENER_HOST', '0.0.0.0')
 LISTENER_PORT = int(os.getenv('LISTENER_PORT', '8080'))
@@ -48,58 +54,95 @@ UNLOCK_TO_LOCK_DELAY = 3  # Delay in seconds between unlock and lock commands
 SESSION_TIMEOUT_SECONDS = 30  # Time allowed per session (seconds)
 # -----------------------------------------
 
+# --- Servo Configuration ---
+SERVO_PIN = 26  # GPIO26 = A0
+SERVO_ANGLES = {"unlock": 5, "lock": 90}
+SERVO_COMMAND_TIMEOUT = 2  # Seconds to wait for the Pico to acknowledge a command
+# Run in the Pico's REPL once per connection; the controller then stays alive
+SERVO_CONTROLLER_SETUP = f"import servo\n_servo = servo.ServoController({SERVO_PIN})"
+# -----------------------------------------
+
 
 # Session state
 session_methods = set()
 session_start_time = None
 
+# Persistent link to the Pico, with the servo controller running on it
+servo_link = None
+servo_sequence = 0
+servo_stats = {'commands': 0, 'total_rtt_ms': 0.0, 'max_rtt_ms': 0.0}
+
 def reset_session():
     global session_methods, session_start_time
     session_methods = set()
     session_start_time = None
     logger.info("Session reset.")
 
-def send_command_to_servo(command):
+def connect_servo():
     """
-    Sends a command to the Pico using mpremote exec to directly control the servo.
+    Return the link to the Pico, opening it and starting the servo controller if needed.
+    Raises PicoLinkError if the Pico cannot be reached.
     """
-    logger.info(f"Sending command via mpremote exec: {command}")
+    global servo_link
+    if servo_link is not None and servo_link.connected:
+        return servo_link
+    close_servo_link()
+
+    link = PicoLink()
     try:
-        # Construct the Python code to execute on the Pico
-        pico_code = ""
-        if command == "unlock":
-            # Ensure servo module is imported, Pin is imported, create object, turn
-            pico_code = "import servo; from machine import Pin; s = servo.SERVO(Pin(26)); s.turn(5); print('unlock command executed')"
-        elif command == "lock":
-            # Ensure servo module is imported, Pin is imported, create object, turn
-            pico_code = "import servo; from machine import Pin; s = servo.SERVO(Pin(26)); s.turn(90); print('lock command executed')"
-        else:
-            logger.warning(f"Unknown servo command: {command}")
-            return
+        # Soft reset, so the controller runs the servo.py that is on the Pico now
+        link.open()
+        link.exec(SERVO_CONTROLLER_SETUP)
+    except PicoLinkError:
+        link.close()
+        raise
+    servo_link = link
+    logger.info(f"Servo controller running on Pico ({link.port}), pin GPIO{SERVO_PIN}")
+    return link
 
-        # Execute the code on the Pico using mpremote
-        result = subprocess.run(
-            ["mpremote", "exec", pico_code],
-            capture_output=True,
-            text=True,
-            timeout=5  # Add a timeout
-        )
-
-        if result.returncode == 0:
-            # Check stdout for confirmation from the Pico print statement
-            if f"{command} command executed" in result.stdout:
-                 logger.info(f"Successfully executed '{command}' command on Pico.")
-                 # logger.debug(f"mpremote output: {result.stdout.strip()}")
-            else:
-                 logger.warning(f"Executed '{command}' on Pico, but confirmation message not found. Output: {result.stdout.strip()}")
+def close_servo_link():
+    global servo_link
+    if servo_link is not None:
+        servo_link.close()
+        servo_link = None
 
-        else:
-            logger.error(f"Failed to execute '{command}' command on Pico via mpremote. Error: {result.stderr}")
+def send_command_to_servo(command):
+    """
+    Sends a command to the servo controller on the Pico and waits for its acknowledgement.
+    Returns True if the Pico acknowledged the command.
+    """
+    global servo_sequence
+    angle = SERVO_ANGLES.get(command)
+    if angle is None:
+        logger.warning(f"Unknown servo command: {command}")
+        return False
 
-    except subprocess.TimeoutExpired:
-         logger.error(f"Timeout executing '{command}' command on Pico via mpremote.")
-    except Exception as e:
-        logger.error(f"Error sending command via mpremote exec: {e}")
+    servo_sequence += 1
+    try:
+        link = connect_servo()
+        start_time = time.perf_counter()
+        ack = link.eval(f"_servo.command({servo_sequence}, {angle})", SERVO_COMMAND_TIMEOUT)
+        rtt_ms = (time.perf_counter() - start_time) * 1000
+    except PicoLinkError as e:
+        logger.error(f"Failed to execute '{command}' command on Pico: {e}")
+        # Reconnect for the next command
+        close_servo_link()
+        return False
+
+    if not isinstance(ack, (list, tuple)) or len(ack) != 2:
+        logger.error(f"Failed to execute '{command}' command on Pico: malformed acknowledgement {ack!r}")
+        return False
+    if tuple(ack) != (servo_sequence, angle):
+        logger.warning(f"Unexpected acknowledgement for '{command}' (#{servo_sequence}): {ack}")
+        return False
+
+    servo_stats['commands'] += 1
+    servo_stats['total_rtt_ms'] += rtt_ms
+    servo_stats['max_rtt_ms'] = max(servo_stats['max_rtt_ms'], rtt_ms)
+    average_ms = servo_stats['total_rtt_ms'] / servo_stats['commands']
+    logger.info(f"Pico acknowledged '{command}' (#{servo_sequence}) in {rtt_ms:.1f} ms "
+                f"(avg {average_ms:.1f} ms, max {servo_stats['max_rtt_ms']:.1f} ms over {servo_stats['commands']} commands)")
+    return True
 
 def handle_message(message):
     """
@@ -149,27 +192,29 @@ def handle_message(message):
 
 def check_and_copy_servo_files():
     """
-    Check and copy servo.py to the Pico using mpremote.
-    Always copies the latest version.
+    Copy servo.py to the Pico, as .mpy bytecode when possible, if the Pico's copy differs.
+    The Pico hashes its copy, so an unchanged file is not sent again.
     """
-    servo_py_src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pico_sensors", "servo_motor", "servo.py")
-    servo_py_dst = ":servo.py"
+    servo_py_src = os.path.join(project_root, "pico_sensors", "servo_motor", "servo.py")
 
     if not os.path.exists(servo_py_src):
         logger.error(f"Cannot find source file at {servo_py_src}")
         return # Stop if servo.py is missing
 
+    link = PicoLink()
     try:
-        # Delete the existing servo.py file on the Pico if it exists
-        subprocess.run(["mpremote", "rm", servo_py_dst], capture_output=True, text=True)
-        # Copy the servo.py file to the Pico
-        result = subprocess.run(["mpremote", "cp", servo_py_src, servo_py_dst], capture_output=True, text=True)
-        if result.returncode == 0:
-            logger.info(f"Successfully copied servo.py to Pico")
+        link.open(soft_reset=False)
+        files, stale_file = module_files(servo_py_src, "servo", link.mpy_version())
+        if link.deploy(files):
+            logger.info(f"Successfully copied {', '.join(files)} to Pico")
         else:
-            logger.error(f"Failed to copy servo.py: {result.stderr}")
-    except Exception as e:
+            logger.info(f"{', '.join(files)} on Pico is up to date")
+        link.remove(stale_file)
+    except (PicoLinkError, OSError) as e:
         logger.error(f"Error copying servo.py: {e}")
+    finally:
+        # connect_servo() opens the link again for the servo controller
+        link.close()
 
 def start_listener_server():
     """Starts the TCP server to listen for authentication events."""
@@ -234,4 +279,9 @@ def start_listener_server():
 
 if __name__ == "__main__":
     check_and_copy_servo_files()
+    try:
+        connect_servo()
+    except PicoLinkError as e:
+        logger.error(f"Could not start servo controller, will retry on the first command: {e}")
+    atexit.register(close_servo_link)
     start_listener_server()
\ No newline at end of file
@@ -7,23 +7,79 @@ Current sensors:
 - Touch Pattern Lock (GPIO 26)
 - Rotary Angle Sensor (ADC Pin 28)
 
+Output protocol (read by the web server over USB serial):
+- Events are one JSON object per line, e.g.
+  {"e": "touch_end", "s": "touch", "d": 1200, "ts": 48210}
+  with keys e (event type), s (sensor), n (pattern step), d (duration in ms),
+  a (angle in degrees), r (reason) and ts (device time, time.ticks_ms()).
+  Event types: ready, mode, touch_start, touch_end, step, success, failure,
+  angle, settings.
+- Human-readable debug output goes on lines starting with "# " and is never
+  parsed. Set DEBUG = False to turn it off.
+
+Touch input is interrupt driven: a Pin.irq handler on both edges records
+each edge's time and level in a preallocated ring buffer, and the main loop
+debounces and classifies taps and holds from those timestamps. The loop
+never sleeps to debounce, and tap durations are measured from the edges
+themselves rather than from when the loop got round to noticing them.
+
+The rotary sensor is sampled by a machine.Timer at ROTARY_SAMPLE_HZ into a
+moving average kept as a running sum. Angle reports only follow changes
+larger than the hysteresis band (rotary_threshold), and are sent at most
+ROTARY_REPORT_HZ times a second; the latest angle is always sent once the
+interval has passed, so the host still ends up with the final position.
+
+The work is split across the RP2040's two cores. The sensor loop
+(debouncing, pattern matching) runs on a _thread, which MicroPython runs on
+core 1, and puts events into a preallocated ring protected by a lock; the
+ring is the only handoff between it and report_events(). Core 0 takes the
+events out, serializes them to JSON and writes them to USB, so a slow or
+blocked USB link never holds up the sensor loop; if the ring fills up,
+events are dropped and counted. The touch and sampling interrupt handlers
+only fill their own preallocated buffers, so it does not matter which core
+runs them.
+main() runs the reporter in a loop on core 0; start() runs it from a timer
+instead and returns, leaving the REPL free (this is how the web server
+starts the program).
+
+Settings can be changed while the program runs: the web server calls
+reload_settings() from the REPL over the serial link, which swaps in the new
+touch pattern and sends a "settings" event as an acknowledgement.
+
 Author: James Kong
 """
 
-from machine import Pin, ADC
+from machine import Pin, ADC, Timer
 import time
 import sys
 import json
 import os
+import array
+import _thread
+import micropython
+
+# Lets an exception raised in an interrupt handler be reported
+micropython.alloc_emergency_exception_buf(100)
 
 # === Configuration ===
 # Sensor selection thresholds
 ROTARY_CHANGE_THRESHOLD = 10  # Minimum angle change to activate rotary sensor mode
 TOUCH_ACTIVATION_THRESHOLD = 1  # Touch sensor is binary (1 = touched)
 
+# Rotary sampling and reporting rates
+ROTARY_SAMPLE_HZ = 200  # ADC samples per second, taken by a timer
+ROTARY_REPORT_HZ = 20  # Maximum angle events per second
+
+# Event ring between the sensor loop (core 1) and the USB reporter (core 0)
+EVENT_QUEUE_SIZE = 64
+EVENT_REPORT_HZ = 100  # How often start()'s timer drains the ring
+
 # Timeout settings
 SENSOR_TIMEOUT = 5000  # ms - time before returning to idle if no activity
 
+# Print human-readable debug lines alongside the events
+DEBUG = True
+
 # === Initialize Sensors ===
 # Touch sensor
 touch_sensor = Pin(26, mode=Pin.IN, pull=Pin.PULL_UP)
@@ -49,16 +105,135 @@ touch_max_tap_interval = 500
 touch_is_holding = False
 touch_timeout_message_printed = False
 
+# Touch edge queue, filled by the pin interrupt handler. Preallocated, since
+# the handler runs as a hard IRQ and must not allocate memory.
+TOUCH_EDGE_QUEUE_SIZE = 32
+touch_edge_ticks = array.array('i', [0] * TOUCH_EDGE_QUEUE_SIZE)
+touch_edge_values = bytearray(TOUCH_EDGE_QUEUE_SIZE)
+touch_edge_head = 0  # Next slot the interrupt handler writes
+touch_edge_tail = 0  # Next slot the main loop reads
+touch_edges_dropped = 0
+touch_edges_dropped_reported = 0
+
+# Debounce state: an edge burst is pending until the line has been quiet
+# for touch_debounce_time
+touch_edge_pending = False
+touch_pending_since = 0  # First edge of the burst, used as the transition time
+touch_pending_value = 0  # Level read at the latest edge
+touch_last_edge_time = 0
+
 # Rotary sensor variables
 rotary_prev_angle = -1
-rotary_threshold = 5
+rotary_threshold = 5  # Hysteresis band: smaller changes are not reported
+rotary_last_report_time = 0
+# Moving average window, filled by the sampling timer. rotary_sum is kept
+# equal to sum(rotary_readings), so averaging costs the same for any size.
 rotary_buffer_size = 10
-rotary_readings = [0] * rotary_buffer_size
+rotary_readings = array.array('H', [0] * rotary_buffer_size)
 rotary_index = 0
+rotary_sum = 0
+rotary_timer = None
+
+# Event ring: one slot per event across these preallocated arrays. The
+# string slots only ever hold references to existing strings. A slot's event
+# is None for a debug line, whose text is in event_texts.
+event_names = [None] * EVENT_QUEUE_SIZE
+event_sensors = [None] * EVENT_QUEUE_SIZE
+event_reasons = [None] * EVENT_QUEUE_SIZE
+event_texts = [None] * EVENT_QUEUE_SIZE
+event_steps = array.array('i', [0] * EVENT_QUEUE_SIZE)
+event_durations = array.array('i', [0] * EVENT_QUEUE_SIZE)
+event_angles = array.array('i', [0] * EVENT_QUEUE_SIZE)
+event_ticks = array.array('i', [0] * EVENT_QUEUE_SIZE)
+event_head = 0  # Next slot written by post_event()
+event_tail = 0  # Next slot read by report_events()
+events_dropped = 0
+events_dropped_reported = 0
+event_lock = _thread.allocate_lock()
+report_timer = None
 
 # Path to the settings file on the Pico filesystem
 SETTINGS_FILE_PATH = "settings.json" 
 
+def post_event(event, sensor, n, d, a, r, text):
+    """Put one event in the ring for the reporter; dropped if the ring is full"""
+    global event_head, events_dropped
+    with event_lock:
+        next_head = (event_head + 1) % EVENT_QUEUE_SIZE
+        if next_head == event_tail:
+            events_dropped += 1
+            return
+        event_names[event_head] = event
+        event_sensors[event_head] = sensor
+        event_steps[event_head] = n
+        event_durations[event_head] = d
+        event_angles[event_head] = a
+        event_reasons[event_head] = r
+        event_texts[event_head] = text
+        event_ticks[event_head] = time.ticks_ms()
+        event_head = next_head
+
+def emit_event(event, sensor=None, n=-1, d=-1, a=-1, r=None):
+    """Queue one event record for the host; fields left at -1/None are omitted"""
+    post_event(event, sensor, n, d, a, r, None)
+
+def debug(message):
+    """Queue a human-readable line for the debug channel"""
+    if DEBUG:
+        post_event(None, None, -1, -1, -1, None, message)
+
+def report_events(timer=None):
+    """Write the queued events to USB as JSON lines. Runs on core 0.
+
+    The lock is only held while a slot is copied out, never while printing.
+    It is never waited for: as a timer callback this can run on core 0 in
+    the middle of post_event() (from reload_settings()), and the lock is not
+    reentrant. If it is taken, the ring is drained on the next call.
+    """
+    global event_tail, events_dropped_reported
+    while True:
+        if not event_lock.acquire(0):
+            return
+        try:
+            if event_tail == event_head:
+                dropped = events_dropped
+                break
+            event = event_names[event_tail]
+            sensor = event_sensors[event_tail]
+            n = event_steps[event_tail]
+            d = event_durations[event_tail]
+            a = event_angles[event_tail]
+            r = event_reasons[event_tail]
+            text = event_texts[event_tail]
+            ts = event_ticks[event_tail]
+            # Don't keep the message alive in the ring
+            event_texts[event_tail] = None
+            event_tail = (event_tail + 1) % EVENT_QUEUE_SIZE
+        finally:
+            event_lock.release()
+        
+        if event is None:
+            print("# " + text)
+            continue
+        fields = {"e": event}
+        if sensor is not None:
+            fields["s"] = sensor
+        if n >= 0:
+            fields["n"] = n
+        if d >= 0:
+            fields["d"] = d
+        if a >= 0:
+            fields["a"] = a
+        if r is not None:
+            fields["r"] = r
+        fields["ts"] = ts
+        print(json.dumps(fields))
+    
+    if dropped != events_dropped_reported:
+        if DEBUG:
+            print(f"# Event ring overflowed ({dropped} events dropped)")
+        events_dropped_reported = dropped
+
 def load_touch_pattern_from_settings(filepath):
     """Load the touch pattern from the settings JSON file"""
     try:
@@ -66,34 +241,39 @@ def load_touch_pattern_from_settings(filepath):
         try:
             stat = os.stat(filepath)
             if stat[6] == 0:  # Size is 0
-                print(f"Settings file is empty: {filepath}")
+                debug(f"Settings file is empty: {filepath}")
                 return None
         except OSError:
-            print(f"Settings file not found: {filepath}")
+            debug(f"Settings file not found: {filepath}")
             return None
             
         # Open and read the file
         with open(filepath, 'r') as f:
             settings_data = json.load(f)
             
-        # Extract pattern from the data
-        if 'customPattern' in settings_data and isinstance(settings_data['customPattern'], list) and len(settings_data['customPattern']) > 0:
-            # Convert the JSON format to tuple format
-            pattern = []
-            for step in settings_data['customPattern']:
-                if isinstance(step, dict) and 'action' in step and 'duration' in step:
-                    pattern.append((step['action'], step['duration']))
-            
-            if len(pattern) > 0:
-                print(f"Loaded pattern from {filepath} with {len(pattern)} steps")
-                return pattern
-                
-        print("No valid 'customPattern' found in settings file")
-        return None
+        pattern = parse_touch_pattern(settings_data)
+        if pattern:
+            debug(f"Loaded pattern from {filepath} with {len(pattern)} steps")
+        return pattern
     except Exception as e:
-        print(f"Error loading pattern from settings file: {e}")
+        debug(f"Error loading pattern from settings file: {e}")
         return None
 
+def parse_touch_pattern(settings_data):
+    """Convert the 'customPattern' setting to a list of (action, duration) tuples"""
+    if 'customPattern' in settings_data and isinstance(settings_data['customPattern'], list) and len(settings_data['customPattern']) > 0:
+        # Convert the JSON format to tuple format
+        pattern = []
+        for step in settings_data['customPattern']:
+            if isinstance(step, dict) and 'action' in step and 'duration' in step:
+                pattern.append((step['action'], step['duration']))
+        
+        if len(pattern) > 0:
+            return pattern
+            
+    debug("No valid 'customPattern' found in settings")
+    return None
+
 def initialize_touch_sensor():
     """Load touch sensor pattern from settings.json and initialize variables"""
     global custom_pattern
@@ -103,54 +283,135 @@ def initialize_touch_sensor():
     
     if settings_pattern:
         custom_pattern = settings_pattern
-        print(f"Using pattern from {SETTINGS_FILE_PATH}")
+        debug(f"Using pattern from {SETTINGS_FILE_PATH}")
     else:
         # Fallback to default if settings file is missing, empty, or invalid
         custom_pattern = DEFAULT_PATTERN
-        print(f"Could not load pattern from {SETTINGS_FILE_PATH}. Using built-in default pattern.")
+        debug(f"Could not load pattern from {SETTINGS_FILE_PATH}. Using built-in default pattern.")
 
-    print(f"Active pattern: {custom_pattern}")
+    debug(f"Active pattern: {custom_pattern}")
 
-def read_rotary_angle():
-    """Read and process the rotary angle sensor value"""
-    global rotary_readings, rotary_index
+def reload_settings(settings_json=None):
+    """Swap in a new touch pattern without restarting the program.
+
+    Args:
+        settings_json: the settings as a JSON string, sent by the web server;
+            if omitted, settings.json is re-read from the Pico filesystem
+    """
+    global custom_pattern
     
-    # Read the current analog value
-    current_value = rotary_adc.read_u16()
+    try:
+        if settings_json is None:
+            pattern = load_touch_pattern_from_settings(SETTINGS_FILE_PATH)
+        else:
+            pattern = parse_touch_pattern(json.loads(settings_json))
+    except Exception as e:
+        debug(f"SETTINGS RELOAD FAILED: {e}")
+        return False
     
-    # Add to moving average buffer
-    rotary_readings[rotary_index] = current_value
-    rotary_index = (rotary_index + 1) % rotary_buffer_size
+    if not pattern:
+        debug("SETTINGS RELOAD FAILED: no valid pattern")
+        return False
+    
+    # Any half-entered pattern was for the old settings
+    custom_pattern = pattern
+    reset_touch_state()
+    emit_event("settings", "touch", n=len(custom_pattern))
+    debug(f"Active pattern: {custom_pattern}")
+    return True
+
+def on_touch_edge(pin):
+    """Pin interrupt handler: queue the edge's time and level. Must not allocate."""
+    global touch_edge_head, touch_edges_dropped
+    next_head = (touch_edge_head + 1) % TOUCH_EDGE_QUEUE_SIZE
+    if next_head == touch_edge_tail:
+        touch_edges_dropped += 1  # Queue full; the main loop re-reads the pin
+        return
+    touch_edge_ticks[touch_edge_head] = time.ticks_ms()
+    touch_edge_values[touch_edge_head] = pin.value()
+    touch_edge_head = next_head
+
+def start_touch_interrupts():
+    """Take the current touch level as settled and start queueing edges"""
+    global touch_last_value, touch_edge_tail, touch_edge_pending
+    touch_edge_tail = touch_edge_head
+    touch_edge_pending = False
+    touch_last_value = touch_sensor.value()
+    touch_sensor.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=on_touch_edge, hard=True)
+
+def settle_touch_edges(now, level, transitions):
+    """Turn a pending edge burst into a transition once it is debounce_time old"""
+    global touch_edge_pending, touch_last_value
+    if not touch_edge_pending or time.ticks_diff(now, touch_last_edge_time) < touch_debounce_time:
+        return
+    touch_edge_pending = False
+    if level != touch_last_value:  # Otherwise it was a glitch
+        touch_last_value = level
+        transitions.append((level, touch_pending_since))
+
+def read_touch_transitions():
+    """Drain the edge queue and debounce it.
+
+    Returns:
+        list: (value, ticks_ms) for each debounced change of the touch level,
+        timed at the first edge of its burst
+    """
+    global touch_edge_tail, touch_edge_pending, touch_pending_since
+    global touch_pending_value, touch_last_edge_time, touch_edges_dropped_reported
+    transitions = []
+    while touch_edge_tail != touch_edge_head:
+        edge_time = touch_edge_ticks[touch_edge_tail]
+        edge_value = touch_edge_values[touch_edge_tail]
+        touch_edge_tail = (touch_edge_tail + 1) % TOUCH_EDGE_QUEUE_SIZE
+        
+        # A gap of debounce_time since the previous edge settles that burst
+        settle_touch_edges(edge_time, touch_pending_value, transitions)
+        if not touch_edge_pending:
+            touch_edge_pending = True
+            touch_pending_since = edge_time
+        touch_pending_value = edge_value
+        touch_last_edge_time = edge_time
     
-    # Calculate moving average
-    avg_value = sum(rotary_readings) // rotary_buffer_size
+    # Read the pin before checking the queue, so an edge arriving in between
+    # is left for the next call rather than mistaken for the settled level
+    level = touch_sensor.value()
+    if touch_edge_tail == touch_edge_head:
+        settle_touch_edges(time.ticks_ms(), level, transitions)
     
-    # Convert to 12-bit and calculate angle
-    adc_12bit = avg_value >> 4 
-    angle = (adc_12bit / 4095) * 360
+    if touch_edges_dropped != touch_edges_dropped_reported:
+        debug(f"Touch edge queue overflowed ({touch_edges_dropped} edges dropped)")
+        touch_edges_dropped_reported = touch_edges_dropped
+    return transitions
+
+def on_rotary_sample(timer):
+    """Timer callback: add one ADC sample to the moving average. Must not allocate."""
+    global rotary_index, rotary_sum
+    value = rotary_adc.read_u16()
+    rotary_sum += value - rotary_readings[rotary_index]
+    rotary_readings[rotary_index] = value
+    rotary_index = (rotary_index + 1) % rotary_buffer_size
+
+def start_rotary_sampler():
+    """Fill the moving average with the current reading and start the sampling timer"""
+    global rotary_sum, rotary_timer
+    value = rotary_adc.read_u16()
+    for i in range(rotary_buffer_size):
+        rotary_readings[i] = value
+    rotary_sum = value * rotary_buffer_size
+    rotary_timer = Timer(mode=Timer.PERIODIC, freq=ROTARY_SAMPLE_HZ, callback=on_rotary_sample, hard=True)
+
+def read_rotary_angle():
+    """Return the rotary angle, from the moving average of the timer's samples"""
+    avg_value = rotary_sum // rotary_buffer_size
     
-    return round(angle)
+    # Convert to 12-bit and calculate angle, rounded to the nearest degree
+    adc_12bit = avg_value >> 4
+    return (adc_12bit * 360 + 2047) // 4095
 
 def check_touch_sensor():
     """Check the touch sensor and update state if needed"""
-    global current_state, touch_last_value, last_activity_time
-    
-    current_value = touch_sensor.value()
-    
-    # Detect change in touch state (with debounce)
-    if current_value != touch_last_value:
-        time.sleep_ms(touch_debounce_time)  # Debounce
-        # Re-read to confirm
-        if current_value == touch_sensor.value():
-            # Touch started
-            if current_value == 1:
-                if current_state != "touch":
-                    print("Touch sensor activated")
-                    current_state = "touch"
-                    last_activity_time = time.ticks_ms()
-                    reset_touch_state()
-            
-            touch_last_value = current_value
+    for value, edge_time in read_touch_transitions():
+        handle_touch_transition(value, edge_time)
     
     return current_state == "touch"
 
@@ -163,7 +424,7 @@ def check_rotary_sensor():
     # If this is the first reading or there's a significant change
     if rotary_prev_angle == -1 or abs(current_angle - rotary_prev_angle) >= ROTARY_CHANGE_THRESHOLD:
         if current_state != "rotary":
-            print("Rotary sensor activated")
+            emit_event("mode", "rotary")
             current_state = "rotary"
             last_activity_time = time.ticks_ms()
         rotary_prev_angle = current_angle
@@ -177,63 +438,69 @@ def reset_touch_state():
     current_pattern_step = 0
     touch_timeout_message_printed = False
 
+def handle_touch_transition(value, edge_time):
+    """Process one debounced touch change, timed at its edge"""
+    global current_state, current_pattern_step, touch_start_time, touch_last_tap_time
+    global touch_is_holding, last_activity_time
+    
+    # A touch switches to touch mode, and counts as the start of the pattern
+    if value == 1 and current_state != "touch":
+        emit_event("mode", "touch")
+        current_state = "touch"
+        reset_touch_state()
+    if current_state != "touch":
+        return
+    
+    # Touch started
+    if value == 1:
+        touch_start_time = edge_time
+        emit_event("touch_start", "touch")
+        touch_is_holding = True
+        last_activity_time = edge_time
+        return
+    
+    # Touch ended; a release without a press (touched before start) is ignored
+    if not touch_is_holding:
+        return
+    tap_duration = time.ticks_diff(edge_time, touch_start_time)
+    emit_event("touch_end", "touch", d=tap_duration)
+    touch_is_holding = False
+    last_activity_time = edge_time
+    
+    # Process the current step in the pattern
+    if current_pattern_step < len(custom_pattern):
+        action, duration = custom_pattern[current_pattern_step]
+        
+        if (action == "tap" and tap_duration) or (action == "hold" and tap_duration >= duration):
+            current_pattern_step += 1
+            emit_event("step", "touch", n=current_pattern_step, d=tap_duration)
+        else:
+            emit_event("failure", "touch", n=current_pattern_step + 1, r="incorrect")
+            current_pattern_step = 0
+    
+    # Check if the pattern is complete
+    if current_pattern_step == len(custom_pattern):
+        emit_event("success", "touch")
+        current_pattern_step = 0  # Reset for the next attempt
+    
+    touch_last_tap_time = edge_time
+
 def handle_touch_sensor():
     """Handle the touch sensor loop iteration"""
-    global current_pattern_step, touch_last_value, touch_start_time, touch_last_tap_time
-    global touch_is_holding, touch_timeout_message_printed, last_activity_time
-    
-    current_value = touch_sensor.value()
-    current_time = time.ticks_ms()
+    global current_pattern_step, touch_timeout_message_printed
     
     # Check for other sensor activity first
     if check_rotary_sensor():
         return
     
-    # Detect touch state change
-    if current_value != touch_last_value:
-        time.sleep_ms(touch_debounce_time)  # Debounce
-        if current_value == touch_sensor.value():
-            # Touch started
-            if current_value == 1:
-                touch_start_time = current_time
-                print("Touch started")
-                touch_is_holding = True
-                last_activity_time = current_time
-            # Touch ended
-            else:
-                tap_duration = time.ticks_diff(current_time, touch_start_time)
-                print(f"Touch ended: {tap_duration}ms")
-                touch_is_holding = False
-                last_activity_time = current_time
-                
-                # Process the current step in the pattern
-                if current_pattern_step < len(custom_pattern):
-                    action, duration = custom_pattern[current_pattern_step]
-                    
-                    if action == "tap" and tap_duration:
-                        print(f"Step {current_pattern_step + 1}: Tap detected")
-                        current_pattern_step += 1
-                    elif action == "hold" and tap_duration >= duration:
-                        print(f"Step {current_pattern_step + 1}: Hold detected ({tap_duration}ms)")
-                        current_pattern_step += 1
-                    else:
-                        print(f"Step {current_pattern_step + 1}: Incorrect input, resetting pattern")
-                        current_pattern_step = 0
-                
-                # Check if the pattern is complete
-                if current_pattern_step == len(custom_pattern):
-                    print("TOUCH - SUCCESS")
-                    current_pattern_step = 0  # Reset for the next attempt
-                
-                touch_last_tap_time = current_time
-            
-            touch_last_value = current_value
+    check_touch_sensor()
+    current_time = time.ticks_ms()
     
     # Reset pattern if too much time passes between actions
     if (current_pattern_step > 0 and not touch_is_holding and touch_last_tap_time > 0 
             and time.ticks_diff(current_time, touch_last_tap_time) > touch_max_tap_interval * 2):
         if not touch_timeout_message_printed:
-            print("Pattern timeout, resetting")
+            emit_event("failure", "touch", n=current_pattern_step + 1, r="timeout")
             touch_timeout_message_printed = True
         current_pattern_step = 0
     elif current_pattern_step == 0:
@@ -241,7 +508,7 @@ def handle_touch_sensor():
 
 def handle_rotary_sensor():
     """Handle the rotary sensor loop iteration"""
-    global rotary_prev_angle, last_activity_time
+    global rotary_prev_angle, rotary_last_report_time, last_activity_time
     
     current_time = time.ticks_ms()
     
@@ -252,11 +519,16 @@ def handle_rotary_sensor():
     # Read the current angle
     current_angle = read_rotary_angle()
     
-    # Only print if the angle has changed significantly
-    if abs(current_angle - rotary_prev_angle) >= rotary_threshold or rotary_prev_angle == -1:
-        print(f"Angle: {current_angle} degrees")
-        rotary_prev_angle = current_angle
-        last_activity_time = current_time
+    # Only report a change beyond the hysteresis band, and not more often
+    # than ROTARY_REPORT_HZ; a change held back now is sent on a later pass
+    if abs(current_angle - rotary_prev_angle) < rotary_threshold and rotary_prev_angle != -1:
+        return
+    if time.ticks_diff(current_time, rotary_last_report_time) < 1000 // ROTARY_REPORT_HZ:
+        return
+    emit_event("angle", "rotary", a=current_angle)
+    rotary_prev_angle = current_angle
+    rotary_last_report_time = current_time
+    last_activity_time = current_time
 
 def check_timeout():
     """Check if the current sensor has timed out from inactivity"""
@@ -267,25 +539,29 @@ def check_timeout():
     
     current_time = time.ticks_ms()
     if time.ticks_diff(current_time, last_activity_time) > SENSOR_TIMEOUT:
-        print(f"Sensor timeout: returning to idle state")
+        emit_event("mode", "idle")
         current_state = "idle"
         return True
     
     return False
 
 # === Main Program ===
-def main():
-    print("Starting Integrated Sensor Controller")
-    print("-------------------------------------")
-    print("Available Sensors:")
-    print("- Touch Pattern Lock (GPIO 26)")
-    print("- Rotary Angle Sensor (ADC 28)")
-    print("-------------------------------------")
+def sensor_loop():
+    """Debounce the sensors and match patterns. Runs on the _thread (core 1)."""
+    debug("Starting Integrated Sensor Controller")
+    debug("-------------------------------------")
+    debug("Available Sensors:")
+    debug("- Touch Pattern Lock (GPIO 26)")
+    debug("- Rotary Angle Sensor (ADC 28)")
+    debug("-------------------------------------")
     
     # Initialize sensors
     initialize_touch_sensor()
+    start_touch_interrupts()
+    start_rotary_sampler()
     
-    print("System ready - waiting for sensor input...")
+    debug("System ready - waiting for sensor input...")
+    emit_event("ready")
     
     # Main loop
     while True:
@@ -310,5 +586,22 @@ def main():
         # Brief sleep to save power
         time.sleep_ms(10)
 
+def start():
+    """Start the sensor loop on core 1 and report its events from a timer on core 0.
+
+    Returns straight away; the timer's callbacks run while core 0 is idle in
+    the REPL, so the host can still call reload_settings().
+    """
+    global report_timer
+    _thread.start_new_thread(sensor_loop, ())
+    report_timer = Timer(mode=Timer.PERIODIC, freq=EVENT_REPORT_HZ, callback=report_events, hard=False)
+
+def main():
+    """Start the sensor loop on core 1 and report its events from this core"""
+    _thread.start_new_thread(sensor_loop, ())
+    while True:
+        report_events()
+        time.sleep_ms(1000 // EVENT_REPORT_HZ)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
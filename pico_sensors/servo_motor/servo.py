@@ -4,7 +4,22 @@ class SERVO:
     def __init__(self, pin):
         self.pin = pin
         self.pwm = PWM(self.pin)
-    
-    def turn(self, val):
         self.pwm.freq(100)
-        self.pwm.duty_u16(int(val/180*13000+4000))
\ No newline at end of file
+
+    def turn(self, val):
+        self.pwm.duty_u16(int(val/180*13000+4000))
+
+class ServoController:
+    """Keeps one SERVO alive between commands from the listener.
+
+    The listener creates it once over its serial link and then calls
+    command() for each actuation, so the module import and PWM setup are
+    not repeated every time the lock moves.
+    """
+    def __init__(self, pin_number=26):
+        self.servo = SERVO(Pin(pin_number))
+
+    def command(self, sequence, angle):
+        """Turn to ``angle`` and return (sequence, angle) as the acknowledgement"""
+        self.servo.turn(angle)
+        return (sequence, angle)
@@ -0,0 +1,221 @@
+"""
+Device Watcher
+--------------
+Notices a USB serial device (the Pico) being plugged in or removed, without
+spawning a process to ask.
+
+On Linux the watcher reads ``/sys/class/tty/ttyACM*`` to find the device's
+USB vendor/product ID, and reports it by its stable ``/dev/serial/by-id``
+name when udev has created one. Where the kernel's netlink uevent socket can
+be opened, the watcher sleeps on it and rescans as soon as a USB or tty
+device changes, so a Pico is seen well under a second after it is attached.
+Without netlink (or off Linux, where ``serial.tools.list_ports`` is used for
+the scan) it polls, backing off exponentially while nothing is attached.
+
+Callbacks run on the watcher thread and should return quickly.
+"""
+
+import os
+import glob
+import time
+import select
+import socket
+import logging
+import threading
+
+from serial.tools import list_ports
+
+logger = logging.getLogger("MFALock")
+
+SYSFS_TTY_DIR = "/sys/class/tty"
+SERIAL_BY_ID_DIR = "/dev/serial/by-id"
+# Poll interval while nothing is attached: starts at the minimum, doubles up to the maximum
+MIN_SCAN_INTERVAL = 0.25  # seconds
+MAX_SCAN_INTERVAL = 5.0  # seconds
+# udev creates device nodes and by-id links shortly after the kernel event
+UEVENT_SETTLE_TIME = 0.2  # seconds
+# Subsystems whose uevents can mean a serial device came or went
+UEVENT_SUBSYSTEMS = (b"SUBSYSTEM=tty", b"SUBSYSTEM=usb")
+# Netlink protocol for kernel uevents (linux/netlink.h); the socket module has no constant for it
+NETLINK_KOBJECT_UEVENT = 15
+
+
+def _read_sysfs_id(path):
+    try:
+        with open(path) as file:
+            return int(file.read().strip(), 16)
+    except (OSError, ValueError):
+        return None
+
+
+def scan_sysfs(vid, pid):
+    """Return the device paths of the matching USB serial ports, found via sysfs."""
+    matches = []
+    for tty in sorted(glob.glob(os.path.join(SYSFS_TTY_DIR, "ttyACM*"))):
+        # tty/<name>/device is the USB interface; its parent is the USB device
+        usb_device = os.path.dirname(os.path.realpath(os.path.join(tty, "device")))
+        if (_read_sysfs_id(os.path.join(usb_device, "idVendor")) == vid
+                and _read_sysfs_id(os.path.join(usb_device, "idProduct")) == pid):
+            matches.append(os.path.join("/dev", os.path.basename(tty)))
+    return matches
+
+
+def stable_name(device):
+    """Return the /dev/serial/by-id link for a device node, or the node itself."""
+    for link in glob.glob(os.path.join(SERIAL_BY_ID_DIR, "*")):
+        if os.path.realpath(link) == device:
+            return link
+    return device
+
+
+def _open_uevent_socket():
+    """Subscribe to kernel uevents, or return None where that is not possible."""
+    if not hasattr(socket, "AF_NETLINK"):
+        return None
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, 1))  # Multicast group 1: kernel events
+        sock.setblocking(False)
+        return sock
+    except OSError as e:
+        logger.info(f"Kernel uevents unavailable ({e}); polling for devices instead")
+        return None
+
+
+class DeviceWatcher:
+    """Watches for a USB serial device and calls back when it appears or goes away."""
+
+    def __init__(self, vid, pid, on_connect=None, on_disconnect=None,
+                 min_interval=MIN_SCAN_INTERVAL, max_interval=MAX_SCAN_INTERVAL):
+        self.vid = vid
+        self.pid = pid
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._port = None
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._uevents = None
+
+    @property
+    def port(self):
+        """The attached device's path, or None."""
+        return self._port
+
+    def scan(self):
+        """Look for the device now; returns its path or None."""
+        if os.path.isdir(SYSFS_TTY_DIR):
+            matches = scan_sysfs(self.vid, self.pid)
+            return stable_name(matches[0]) if matches else None
+        for port in list_ports.comports():
+            if port.vid == self.vid and port.pid == self.pid:
+                return port.device
+        return None
+
+    def start(self):
+        """Scan once, then keep watching on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._uevents = _open_uevent_socket()
+        self._update(self.scan())
+        self._thread = threading.Thread(target=self._watch_loop, name="DeviceWatcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching for USB device {self.vid:04x}:{self.pid:04x} "
+                    f"({'uevents' if self._uevents else 'polling'})")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._uevents is not None:
+            self._uevents.close()
+            self._uevents = None
+
+    def wait_for_device(self, timeout=None):
+        """Block until the device is attached; returns its path, or None on timeout."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._port is not None, timeout)
+            return self._port
+
+    def _watch_loop(self):
+        interval = self.min_interval
+        while not self._stop.is_set():
+            woken = self._sleep(interval)
+            if self._stop.is_set():
+                return
+            if woken:
+                # Let udev finish creating the node and by-id link
+                time.sleep(UEVENT_SETTLE_TIME)
+            try:
+                changed = self._update(self.scan())
+            except Exception as e:
+                logger.error(f"Error scanning for USB devices: {e}")
+                changed = False
+
+            if changed or woken:
+                interval = self.min_interval
+            elif self._port is None:
+                # Nothing attached: back off
+                interval = min(interval * 2, self.max_interval)
+            else:
+                # Attached: removal shows up as a uevent or as an error on the port
+                interval = self.max_interval
+
+    def _sleep(self, interval):
+        """Wait up to ``interval`` seconds; returns True if a relevant uevent arrived."""
+        if self._uevents is None:
+            self._stop.wait(interval)
+            return False
+        deadline = time.monotonic() + interval
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            # Wake at least every second so stop() is noticed
+            readable, _, _ = select.select([self._uevents], [], [], min(remaining, 1.0))
+            if readable and self._drain_uevents():
+                return True
+        return False
+
+    def _drain_uevents(self):
+        relevant = False
+        while True:
+            try:
+                message = self._uevents.recv(8192)
+            except BlockingIOError:
+                return relevant
+            except OSError as e:
+                logger.error(f"Error reading uevents: {e}")
+                return relevant
+            if any(subsystem in message for subsystem in UEVENT_SUBSYSTEMS):
+                relevant = True
+
+    def _update(self, port):
+        """Record the scan result and fire callbacks. Returns True if it changed."""
+        previous = self._port
+        if port == previous:
+            return False
+        with self._changed:
+            self._port = port
+            self._changed.notify_all()
+
+        if previous is not None:
+            logger.info(f"USB device {previous} removed")
+            self._callback(self.on_disconnect, previous)
+        if port is not None:
+            logger.info(f"USB device attached at {port}")
+            self._callback(self.on_connect, port)
+        return True
+
+    def _callback(self, callback, port):
+        if callback is None:
+            return
+        try:
+            callback(port)
+        except Exception as e:
+            logger.error(f"Error in device watcher callback: {e}")
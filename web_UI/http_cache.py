@@ -0,0 +1,190 @@
+"""
+HTTP Caching and Compression
+----------------------------
+Response hooks that let browsers revalidate instead of re-downloading, and
+keep what does get sent small.
+
+- Every successful GET response carries an ETag: a data version when the
+  route has one (see not_modified() / versioned()), a hash of the body
+  otherwise. A matching ``If-None-Match`` is answered with 304 Not Modified.
+- Routes backed by versioned data check the version before doing any work,
+  so a revalidation costs a comparison instead of a database query.
+- JSON, HTML, JS and CSS bodies are compressed with brotli when the optional
+  ``brotli`` package is installed and the browser accepts it, gzip otherwise.
+- ``url_for('static', ...)`` adds a content fingerprint (``?v=<hash>``), and
+  fingerprinted files are cached by the browser for a year. Static files are
+  compressed once per version and kept in memory, so serving them again
+  costs the Pi no CPU.
+"""
+
+import os
+import gzip
+import hashlib
+import logging
+
+from flask import current_app, request
+from werkzeug.http import generate_etag, is_resource_modified
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger("MFALock")
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/css',
+    'text/html',
+    'text/plain',
+    'image/svg+xml',
+}
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 500  # bytes
+# Browser cache lifetime for fingerprinted static URLs
+STATIC_MAX_AGE = 365 * 24 * 60 * 60  # seconds
+
+# static path -> (mtime_ns, fingerprint)
+_static_fingerprints = {}
+# (static path, encoding) -> (mtime_ns, compressed bytes)
+_static_compressed = {}
+
+
+def init_app(app):
+    """Register the fingerprinting and caching hooks on the Flask app."""
+    app.url_defaults(_add_static_fingerprint)
+    app.after_request(_cache_and_compress)
+    logger.info(f"HTTP caching enabled (compression: {'brotli, gzip' if brotli else 'gzip'})")
+
+
+def not_modified(version, last_modified=None):
+    """Return a 304 response if the browser already has this version of the data.
+
+    Args:
+        version: anything that changes whenever the response would (a change
+            counter, a file mtime); used as the ETag
+        last_modified (datetime): when the data last changed, if known
+
+    Returns:
+        Response or None: the 304 to send, or None if the route should build
+        the full response (and pass it through versioned())
+    """
+    etag = str(version)
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = current_app.response_class(status=304)
+    return versioned(response, version, last_modified)
+
+
+def versioned(response, version, last_modified=None):
+    """Tag a response with the data version it was built from."""
+    response.set_etag(str(version), weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Always revalidate; the ETag makes that a cheap 304
+    response.cache_control.no_cache = True
+    return response
+
+
+def _add_static_fingerprint(endpoint, values):
+    if endpoint != 'static' or 'v' in values or 'filename' not in values:
+        return
+    path = safe_join(current_app.static_folder, values['filename'].lstrip('/'))
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return
+
+    cached = _static_fingerprints.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        with open(path, 'rb') as file:
+            cached = (mtime_ns, hashlib.md5(file.read()).hexdigest()[:12])
+        _static_fingerprints[path] = cached
+    values['v'] = cached[1]
+
+
+def _accepted_encoding():
+    if brotli and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _cache_and_compress(response):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if request.endpoint == 'static':
+        return _finish_static(response)
+    # Streamed downloads and send_file() responses handle themselves
+    if response.is_streamed or response.direct_passthrough:
+        return response
+
+    if not response.cache_control.max_age and not response.cache_control.no_store:
+        response.cache_control.no_cache = True
+    if not response.get_etag()[0]:
+        response.set_etag(generate_etag(response.get_data()), weak=True)
+    response.make_conditional(request)
+    if response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    data = response.get_data()
+    if encoding and len(data) >= MIN_COMPRESS_SIZE and 'Content-Encoding' not in response.headers:
+        # Fast settings; dynamic responses are compressed on every request
+        response.set_data(_compress(data, encoding, 5 if encoding == 'br' else 6))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _finish_static(response):
+    if request.args.get('v'):
+        # The URL changes whenever the file does, so it never needs revalidating
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _accepted_encoding()
+    path = safe_join(current_app.static_folder, request.view_args['filename'].lstrip('/'))
+    if not encoding or path is None:
+        return response
+
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = _static_compressed.get((path, encoding))
+        if cached is None or cached[0] != mtime_ns:
+            with open(path, 'rb') as file:
+                data = file.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                return response
+            # Compressed once per version, so use the best (slowest) settings
+            cached = (mtime_ns, _compress(data, encoding, 11 if encoding == 'br' else 9))
+            _static_compressed[(path, encoding)] = cached
+    except OSError as e:
+        logger.error(f"Error compressing static file {path}: {e}")
+        return response
+
+    etag, _ = response.get_etag()
+    # Swap the file stream for the cached bytes
+    response.close()
+    response.direct_passthrough = False
+    response.set_data(cached[1])
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        # Same content, different bytes: only a weak ETag still applies
+        response.set_etag(etag, weak=True)
+    return response
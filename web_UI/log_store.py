@@ -0,0 +1,997 @@
+"""
+Auth Log Store
+--------------
+Persistence for the authentication log used by the web server.
+
+Entries live in a SQLite database (stdlib ``sqlite3``) with indexes on
+timestamp, status and method, so the web UI can page through history and
+filter it without the server ever holding or serializing the whole log.
+Per-status totals are kept up to date as entries are added and deleted, so
+status broadcasts never have to scan the table. A rollup table
+holds the entry counts per day, hour, status and method; it is updated in the
+same transaction as each insert and delete, so dashboard statistics and
+whole-day counts are answered without touching the entries. Every add and
+delete is also numbered in a change feed, so clients can ask for just the
+changes after a cursor instead of re-downloading the log.
+
+Only a rolling retention window is kept in the database. Older days are moved
+into gzip-compressed, date-partitioned archive segments
+(``<archive_dir>/YYYY-MM-DD.ndjson.gz``) which queries scan transparently when
+the requested range reaches back that far. The most recently read days are
+kept decoded as compact AuthLogRecord objects.
+
+Appends can be handed to a background writer thread which group-commits them
+in batches, so callers on the Pico monitor thread or in Socket.IO handlers
+never wait on the SD card.
+
+Opening the store is cheap however much history there is: nothing is read up
+front except the per-status totals from the rollups. The database file is
+memory-mapped, pages of older entries are read from the indexes only when a
+query reaches them, and catching up on rotation after downtime happens on the
+writer thread rather than before the server starts.
+
+Older formats (the ``auth_logs.ndjson`` journal and the original
+``auth_logs.json`` list) are imported automatically the first time the
+database is created.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import queue
+import logging
+import sqlite3
+import threading
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger("MFALock")
+
+# Bumped whenever the schema changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Number of recent changes kept for delta sync. Clients further behind than
+# this are told to reload instead.
+CHANGE_RETENTION = 10000
+
+# Days of history kept in the database before rolling into archive segments
+DEFAULT_RETENTION_DAYS = 30
+ARCHIVE_SUFFIX = '.ndjson.gz'
+
+# Number of decoded archive days kept in memory for paging and counting
+SEGMENT_CACHE_SIZE = 8
+
+# Background writer defaults: how long to gather appends into one commit, and
+# how many entries may wait before append() falls back to writing inline
+DEFAULT_FLUSH_INTERVAL = 0.2  # seconds
+DEFAULT_WRITER_QUEUE_SIZE = 1000
+MAX_BATCH_SIZE = 500
+
+# Bytes of the database file SQLite may memory-map, so index and page reads
+# come straight from the page cache instead of read() calls
+MMAP_SIZE = 64 * 1024 * 1024
+
+# Fsync policies, mapped to SQLite's synchronous setting. With WAL, "normal"
+# only syncs at checkpoints, so a power cut can lose the last few commits.
+FSYNC_POLICIES = {
+    'full': 'FULL',
+    'normal': 'NORMAL',
+    'off': 'OFF',
+}
+
+# Queued by stop_writer() to tell the writer thread to exit
+_STOP_WRITER = object()
+
+# Entry keys that are stored in their own columns. Anything else an event
+# carries is kept as JSON in the ``extra`` column.
+ENTRY_COLUMNS = ('id', 'timestamp', 'user', 'location', 'status', 'message', 'details', 'method')
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class AuthLogRecord:
+    """Compact in-memory form of a log entry.
+
+    The free-text fields are interned so records share one copy of repeated
+    values like 'Main Entrance' or 'Access granted: ...', the UUID is kept as
+    16 bytes and the timestamp as integer microseconds since the epoch. Values
+    that would not round-trip exactly (IDs that are not canonical UUIDs,
+    timestamps with an offset or in another format) are kept as given, so
+    to_entry() always rebuilds the original dict.
+    """
+
+    __slots__ = ('_id', '_timestamp', 'user', 'location', 'status', 'message', 'details', 'method', 'extra')
+
+    def __init__(self, entry):
+        self._id = self._pack_id(entry.get('id'))
+        self._timestamp = self._pack_timestamp(entry.get('timestamp'))
+        for key in ('user', 'location', 'status', 'message', 'details', 'method'):
+            value = entry.get(key)
+            setattr(self, key, sys.intern(value) if isinstance(value, str) else value)
+        self.extra = {key: value for key, value in entry.items() if key not in ENTRY_COLUMNS} or None
+
+    @property
+    def id(self):
+        return str(uuid.UUID(bytes=self._id)) if isinstance(self._id, bytes) else self._id
+
+    @property
+    def timestamp(self):
+        if isinstance(self._timestamp, int):
+            return (_EPOCH + timedelta(microseconds=self._timestamp)).isoformat()
+        return self._timestamp
+
+    def get(self, key, default=None):
+        """Read a field like dict.get(), so entry filters work on records too."""
+        if key in ENTRY_COLUMNS:
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def to_entry(self):
+        """Return the entry as the dict served to the web UI."""
+        entry = {}
+        for column in ENTRY_COLUMNS:
+            value = getattr(self, column)
+            if value is not None:
+                entry[column] = value
+        if self.extra:
+            entry.update(self.extra)
+        return entry
+
+    @staticmethod
+    def _pack_id(log_id):
+        try:
+            parsed = uuid.UUID(log_id)
+        except (AttributeError, TypeError, ValueError):
+            return log_id
+        return parsed.bytes if str(parsed) == log_id else log_id
+
+    @staticmethod
+    def _pack_timestamp(timestamp):
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            return timestamp
+        if parsed.tzinfo is not None or parsed.isoformat() != timestamp:
+            return timestamp
+        return (parsed - _EPOCH) // timedelta(microseconds=1)
+
+
+class AuthLogStore:
+    """Auth log backed by a SQLite database."""
+
+    def __init__(self, db_path, journal_path=None, legacy_path=None,
+                 archive_dir=None, retention_days=DEFAULT_RETENTION_DAYS,
+                 fsync_policy='full', on_commit=None):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}', expected one of {list(FSYNC_POLICIES)}")
+        self.db_path = db_path
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self.archive_dir = archive_dir
+        self.retention_days = retention_days
+        self.fsync_policy = fsync_policy
+        # Called with the latest change cursor after new entries are committed
+        self.on_commit = on_commit
+        self._queue = None
+        self._writer = None
+        self.flush_interval = DEFAULT_FLUSH_INTERVAL
+        self._lock = threading.RLock()
+        self._conn = None
+        self._status_counts = Counter()
+        self._archive_days = []
+        self._segment_cache = OrderedDict()
+        self._retention_cutoff = None
+        # When entries were last added or deleted; for HTTP Last-Modified
+        self.last_modified = None
+
+    def open(self):
+        """Open the database, creating the schema and importing old logs if needed.
+
+        Rotation is left to the writer thread (or the first append without
+        one), so a restart after days offline is not held up archiving them.
+        """
+        started = time.monotonic()
+        with self._lock:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(f'PRAGMA synchronous={FSYNC_POLICIES[self.fsync_policy]}')
+            self._conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < SCHEMA_VERSION:
+                self._create_schema()
+                if version == 0:
+                    self._import_old_logs()
+                self._conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+                self._conn.commit()
+
+            self._scan_archive_dir()
+            if 0 < version < 4:
+                # Older databases only counted the archive per day; recount it per hour
+                self._rebuild_rollups(include_archive=True)
+                self._conn.execute('DROP TABLE IF EXISTS auth_log_archive_counts')
+                self._conn.commit()
+
+            self._load_counters()
+            total = sum(self._status_counts.values())
+            # Changes made before a restart are not tracked, so assume the latest
+            self.last_modified = datetime.now(timezone.utc)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        logger.info(f"Opened auth log database {self.db_path} ({total} entries) in {elapsed_ms:.0f} ms")
+        return self
+
+    def close(self):
+        self.stop_writer()
+        with self._lock:
+            if self._conn:
+                self._conn.close()
+                self._conn = None
+
+    def start_writer(self, flush_interval=DEFAULT_FLUSH_INTERVAL, max_queue=DEFAULT_WRITER_QUEUE_SIZE):
+        """Start the background thread that group-commits appended entries."""
+        if self._writer is not None:
+            return
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = threading.Thread(target=self._writer_loop, name="AuthLogWriter", daemon=True)
+        self._writer.start()
+        logger.info(f"Auth log writer started (flush interval {flush_interval}s, fsync policy '{self.fsync_policy}')")
+
+    def stop_writer(self):
+        """Write out everything still queued and stop the writer thread."""
+        if self._writer is None:
+            return
+        self._queue.put(_STOP_WRITER)
+        self._writer.join()
+        self._writer = None
+        self._queue = None
+        logger.info("Auth log writer stopped")
+
+    def flush(self):
+        """Block until every queued entry has been committed."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def append(self, entry):
+        """Add an entry to the log.
+
+        With the writer running this only queues the entry; it is committed
+        within ``flush_interval``. If the queue is full the entry is written
+        inline instead, so events are never dropped.
+        """
+        if self._writer is not None:
+            try:
+                self._queue.put_nowait(entry)
+                return
+            except queue.Full:
+                logger.warning("Auth log writer queue is full; writing entry inline")
+        self._write_batch([entry])
+
+    def delete(self, log_id):
+        """Remove the entry with the given ID. Returns False if it was not found.
+
+        Archived entries are removed from their day's segment.
+        """
+        return bool(self.delete_many(ids=[log_id]))
+
+    def delete_many(self, ids=None, older_than=None, status=None, method=None):
+        """Delete entries by ID and/or filter in a single transaction.
+
+        The criteria are combined: ``ids`` restricts the delete to those
+        entries, ``older_than`` to timestamps before it, and ``status`` /
+        ``method`` to exact matches. At least one criterion is required.
+        Archived entries are deleted too: IDs not found in the database and
+        filter matches are looked for in the archive segments (only the days
+        before ``older_than``, if given), which are rewritten without them.
+
+        Returns:
+            list: the IDs that were deleted
+        """
+        clauses = []
+        params = []
+        if older_than:
+            clauses.append('timestamp < ?')
+            params.append(older_than)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if method:
+            clauses.append('method = ?')
+            params.append(method)
+        if ids is None and not clauses:
+            raise ValueError("delete_many() needs IDs or at least one filter")
+
+        # Entries still waiting in the writer queue must land before we delete
+        self.flush()
+        with self._lock:
+            rows = []
+            if ids is None:
+                rows = self._conn.execute(
+                    f"SELECT id, timestamp, status, method FROM auth_logs WHERE {' AND '.join(clauses)}", params
+                ).fetchall()
+            else:
+                ids = list(ids)
+                # Stay well under SQLite's bound-parameter limit
+                for offset in range(0, len(ids), 500):
+                    chunk = ids[offset:offset + 500]
+                    where = ' AND '.join(clauses + [f"id IN ({', '.join('?' * len(chunk))})"])
+                    rows += self._conn.execute(
+                        f'SELECT id, timestamp, status, method FROM auth_logs WHERE {where}', params + chunk
+                    ).fetchall()
+            archived = {}
+            if self._archive_days:
+                if ids is None:
+                    # Filters reach back into archived days as well
+                    archived = self._match_archive(None, older_than, status, method)
+                else:
+                    remaining = set(ids) - {row['id'] for row in rows}
+                    if remaining:
+                        archived = self._match_archive(remaining, older_than, status, method)
+            archived_records = [record for found in archived.values() for _, record in found]
+            if not rows and not archived_records:
+                return []
+
+            try:
+                self._conn.executemany('DELETE FROM auth_logs WHERE id = ?', [(row['id'],) for row in rows])
+                for row in rows:
+                    self._record_change('delete', row['id'])
+                    self._update_rollup(row['timestamp'], row['status'], row['method'], -1)
+                for record in archived_records:
+                    self._record_change('delete', record.id)
+                    self._update_rollup(record.timestamp, record.status, record.method, -1)
+                # Segments are rewritten last, so a failure before this leaves them untouched
+                for day, found in archived.items():
+                    removed = {seq for seq, _ in found}
+                    self._replace_segment(day, {seq: record.to_entry() for seq, record in self._read_segment(day)
+                                                if seq not in removed})
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error deleting log entries: {e}")
+                return []
+            finally:
+                if archived:
+                    self._scan_archive_dir()
+
+            for row in rows:
+                self._update_counters(row['status'], -1)
+            for record in archived_records:
+                self._update_counters(record.status, -1)
+            self.last_modified = datetime.now(timezone.utc)
+        return [row['id'] for row in rows] + [record.id for record in archived_records]
+
+    def status_counts(self):
+        """Return the number of entries per status across the whole log."""
+        with self._lock:
+            return dict(self._status_counts)
+
+    def daily_counts(self, day):
+        """Return the number of entries per status on a day (YYYY-MM-DD)."""
+        with self._lock:
+            # A primary-key range lookup in the rollups, so nothing is kept per day in memory
+            rows = self._conn.execute(
+                'SELECT status, SUM(total) AS total FROM auth_log_rollups WHERE day = ? GROUP BY status', (day,)
+            )
+            return {row['status']: row['total'] for row in rows if row['total']}
+
+    def count(self, status=None, method=None, start=None, end=None, search=None):
+        """Count the entries matching the given filters, including archived ones."""
+        with self._lock:
+            if not search and self._is_day_aligned(start, end):
+                # Whole-day ranges can be answered from the rollups alone
+                clauses = []
+                params = []
+                for column, value in (('status', status), ('method', method)):
+                    if value:
+                        clauses.append(f'{column} = ?')
+                        params.append(value)
+                if start:
+                    clauses.append('day >= ?')
+                    params.append(start[:10])
+                if end:
+                    clauses.append('day <= ?')
+                    params.append(end[:10])
+                where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+                return self._conn.execute(
+                    f'SELECT COALESCE(SUM(total), 0) FROM auth_log_rollups {where}', params
+                ).fetchone()[0]
+
+            where, params = self._build_filters(status, method, start, end, search)
+            total = self._conn.execute(f'SELECT COUNT(*) FROM auth_logs {where}', params).fetchone()[0]
+            # Needs a look at the archived entries themselves
+            for day in self._archive_days_in_range(start, end):
+                total += sum(1 for seq, record in self._read_segment(day)
+                             if self._matches(record, status, method, start, end, search))
+            return total
+
+    def stats(self, days=30):
+        """Return dashboard statistics from the rollups.
+
+        Returns:
+            dict: ``totals`` and ``today`` per status, plus ``by_day`` (the last
+            ``days`` days, oldest first), ``by_method`` and ``by_hour`` (hour of
+            day, 0-23) breakdowns with a count per status in each bucket
+        """
+        today = datetime.now().date()
+        first_day = (today - timedelta(days=days - 1)).isoformat()
+        with self._lock:
+            totals = self._conn.execute(
+                'SELECT status, SUM(total) AS total FROM auth_log_rollups GROUP BY status'
+            ).fetchall()
+            day_rows = self._conn.execute(
+                'SELECT day, status, SUM(total) AS total FROM auth_log_rollups '
+                'WHERE day >= ? GROUP BY day, status', (first_day,)
+            ).fetchall()
+            method_rows = self._conn.execute(
+                'SELECT method, status, SUM(total) AS total FROM auth_log_rollups GROUP BY method, status'
+            ).fetchall()
+            hour_rows = self._conn.execute(
+                'SELECT hour, status, SUM(total) AS total FROM auth_log_rollups '
+                'WHERE hour >= 0 GROUP BY hour, status'
+            ).fetchall()
+
+        def buckets(keys):
+            return {key: Counter(success=0, failure=0) for key in keys}
+
+        by_day = buckets((today - timedelta(days=offset)).isoformat() for offset in reversed(range(days)))
+        for row in day_rows:
+            if row['day'] in by_day:
+                by_day[row['day']][row['status'] or 'unknown'] += row['total']
+        by_method = defaultdict(lambda: Counter(success=0, failure=0))
+        for row in method_rows:
+            by_method[row['method'] or 'unknown'][row['status'] or 'unknown'] += row['total']
+        by_hour = buckets(range(24))
+        for row in hour_rows:
+            by_hour[row['hour']][row['status'] or 'unknown'] += row['total']
+
+        today_key = today.isoformat()
+        return {
+            'totals': {row['status'] or 'unknown': row['total'] for row in totals if row['total']},
+            'today': {status: total for status, total in by_day[today_key].items() if total},
+            'by_day': [{'day': day, **counts} for day, counts in by_day.items()],
+            'by_method': sorted(({'method': method, **counts} for method, counts in by_method.items()
+                                 if sum(counts.values())),
+                                key=lambda bucket: bucket['method']),
+            'by_hour': [{'hour': hour, **counts} for hour, counts in by_hour.items()],
+        }
+
+    def query(self, limit=DEFAULT_PAGE_SIZE, before=None, status=None, method=None,
+              start=None, end=None, search=None):
+        """Return one page of entries, newest first.
+
+        Pagination is keyset-based: ``before`` is the ``next_before`` cursor
+        from the previous page, so fetching a page costs the same no matter
+        how deep into the history it is.
+
+        Returns:
+            tuple: (entries, next_before) where next_before is None on the last page
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = self._build_filters(status, method, start, end, search)
+
+        before_key = None
+        if before:
+            before_key = self.parse_cursor(before)
+            where += ' AND ' if where else 'WHERE '
+            where += '(timestamp < ? OR (timestamp = ? AND seq < ?))'
+            params += [before_key[0], before_key[0], before_key[1]]
+
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT * FROM auth_logs {where} ORDER BY timestamp DESC, seq DESC LIMIT ?',
+                params + [limit + 1]
+            ).fetchall()
+            results = [(row['timestamp'], row['seq'], self._row_to_entry(row)) for row in rows]
+
+            # Archived days are older than the window, so they only matter when
+            # the database ran out of rows or reached back into archived days
+            if self._archive_days and (len(results) <= limit or results[-1][0][:10] <= self._archive_days[-1]):
+                results += self._query_archive(limit + 1, before_key, status, method, start, end, search)
+                results.sort(key=lambda result: (result[0], result[1]), reverse=True)
+                results = results[:limit + 1]
+
+        next_before = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_before = f"{results[-1][0]}|{results[-1][1]}"
+
+        return [entry for _, _, entry in results], next_before
+
+    def iter_entries(self, batch_size=500, **filters):
+        """Yield every entry matching the filters, newest first.
+
+        Walks the log one keyset page at a time, so memory use stays flat no
+        matter how much history (including archives) is exported.
+        """
+        before = None
+        while True:
+            entries, before = self.query(limit=batch_size, before=before, **filters)
+            yield from entries
+            if before is None:
+                return
+
+    def rotate(self):
+        """Move entries older than the retention window into archive segments.
+
+        Each day's segment is rewritten (merged with anything already archived
+        for that day) and replaced atomically before the rows are deleted, so a
+        crash part-way through never loses entries.
+
+        Returns:
+            int: the number of entries archived
+        """
+        if not self.archive_dir or not self.retention_days:
+            return 0
+
+        with self._lock:
+            cutoff = self._current_cutoff()
+            self._retention_cutoff = cutoff
+            rows = self._conn.execute(
+                'SELECT * FROM auth_logs WHERE timestamp < ? ORDER BY timestamp, seq', (cutoff,)
+            ).fetchall()
+
+            rows_by_day = defaultdict(list)
+            for row in rows:
+                try:
+                    day = date.fromisoformat(row['timestamp'][:10]).isoformat()
+                except ValueError:
+                    continue  # Leave entries with unparseable timestamps in the database
+                rows_by_day[day].append(row)
+            if not rows_by_day:
+                return 0
+
+            archived = 0
+            try:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                for day, day_rows in rows_by_day.items():
+                    self._write_segment(day, [(row['seq'], self._row_to_entry(row)) for row in day_rows])
+                    self._conn.executemany('DELETE FROM auth_logs WHERE seq = ?', [(row['seq'],) for row in day_rows])
+                    archived += len(day_rows)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error archiving old log entries: {e}")
+                return 0
+            finally:
+                self._scan_archive_dir()
+
+        logger.info(f"Archived {archived} log entries older than {cutoff} to {self.archive_dir}")
+        return archived
+
+    def current_change(self):
+        """Return the number of the latest change, the cursor to pass to changes_since()."""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(change), 0) FROM auth_log_changes').fetchone()[0]
+
+    def changes_since(self, since, status=None, method=None, start=None, end=None, search=None):
+        """Return the entries added and the IDs deleted after change number ``since``.
+
+        Added entries are filtered like query(), newest first.
+
+        Returns:
+            dict: {'logs', 'deleted', 'cursor'}, or None if ``since`` is older than
+            the retained change feed (or too many changes happened) and the
+            caller should reload from query() instead
+        """
+        with self._lock:
+            oldest, latest = self._conn.execute('SELECT MIN(change), MAX(change) FROM auth_log_changes').fetchone()
+            if since > (latest or 0) or (oldest is not None and since < oldest - 1):
+                return None
+
+            changes = self._conn.execute(
+                'SELECT change, op, log_id FROM auth_log_changes WHERE change > ? ORDER BY change LIMIT ?',
+                (since, MAX_PAGE_SIZE + 1)
+            ).fetchall()
+            if len(changes) > MAX_PAGE_SIZE:
+                return None
+
+            cursor = changes[-1]['change'] if changes else since
+            added = [row['log_id'] for row in changes if row['op'] == 'add']
+            deleted = [row['log_id'] for row in changes if row['op'] == 'delete']
+
+            logs = []
+            if added:
+                where, params = self._build_filters(status, method, start, end, search)
+                where += ' AND ' if where else 'WHERE '
+                where += f"id IN ({', '.join('?' * len(added))})"
+                rows = self._conn.execute(
+                    f'SELECT * FROM auth_logs {where} ORDER BY timestamp DESC, seq DESC',
+                    params + added
+                ).fetchall()
+                logs = [self._row_to_entry(row) for row in rows]
+
+        return {'logs': logs, 'deleted': deleted, 'cursor': cursor}
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """Split a ``timestamp|seq`` pagination cursor. Raises ValueError if malformed."""
+        timestamp, _, seq = cursor.rpartition('|')
+        if not timestamp:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        return timestamp, int(seq)
+
+    def _load_counters(self):
+        """Seed the running per-status totals from the rollups."""
+        self._status_counts.clear()
+        rows = self._conn.execute('SELECT status, SUM(total) AS total FROM auth_log_rollups GROUP BY status')
+        for row in rows:
+            self._status_counts[row['status']] += row['total']
+
+    def _update_counters(self, status, delta):
+        self._status_counts[status or ''] += delta
+
+    @staticmethod
+    def _rollup_key(timestamp, status, method):
+        """Return the (day, hour, status, method) rollup bucket for an entry."""
+        timestamp = timestamp or ''
+        hour = timestamp[11:13]
+        # Missing values are stored as '' / -1 so they still form a primary key
+        return (timestamp[:10], int(hour) if hour.isdigit() else -1, status or '', method or '')
+
+    def _update_rollup(self, timestamp, status, method, delta):
+        self._conn.execute(
+            'INSERT INTO auth_log_rollups (day, hour, status, method, total) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (day, hour, status, method) DO UPDATE SET total = total + excluded.total',
+            self._rollup_key(timestamp, status, method) + (delta,)
+        )
+
+    def _rebuild_rollups(self, include_archive=False):
+        """Recount the rollups from the live entries and, optionally, the archive segments."""
+        totals = Counter(
+            self._rollup_key(row['timestamp'], row['status'], row['method'])
+            for row in self._conn.execute('SELECT timestamp, status, method FROM auth_logs')
+        )
+        if include_archive:
+            for day in self._archive_days:
+                totals.update(self._rollup_key(record.timestamp, record.status, record.method)
+                              for seq, record in self._read_segment(day))
+        self._conn.execute('DELETE FROM auth_log_rollups')
+        self._conn.executemany(
+            'INSERT INTO auth_log_rollups (day, hour, status, method, total) VALUES (?, ?, ?, ?, ?)',
+            [key + (total,) for key, total in totals.items()]
+        )
+        logger.info(f"Rebuilt auth log rollups ({sum(totals.values())} entries)")
+
+    def _writer_loop(self):
+        """Gather queued entries for up to ``flush_interval`` and commit them together."""
+        # Catch up on rotation (deferred by open()) before the first batch
+        try:
+            self.rotate()
+        except Exception as e:
+            logger.error(f"Error rotating auth logs: {e}")
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not _STOP_WRITER and len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            entries = [entry for entry in batch if entry is not _STOP_WRITER]
+            try:
+                if entries:
+                    self._write_batch(entries)
+            except Exception as e:
+                logger.error(f"Error in auth log writer: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if batch[-1] is _STOP_WRITER:
+                return
+
+    def _write_batch(self, entries):
+        """Insert entries in one transaction and update the counters.
+
+        Each entry gets its own savepoint, so a bad entry is skipped without
+        losing the rest of the batch.
+        """
+        with self._lock:
+            written = []
+            try:
+                # Open the transaction explicitly; releasing the outermost
+                # savepoint would otherwise commit after every entry
+                if not self._conn.in_transaction:
+                    self._conn.execute('BEGIN')
+                for entry in entries:
+                    self._conn.execute('SAVEPOINT log_entry')
+                    try:
+                        self._insert(entry)
+                        self._record_change('add', entry.get('id'))
+                    except Exception as e:
+                        self._conn.execute('ROLLBACK TO log_entry')
+                        self._conn.execute('RELEASE log_entry')
+                        logger.error(f"Skipping log entry {entry.get('id')!r}: {e}")
+                        continue
+                    self._conn.execute('RELEASE log_entry')
+                    written.append(entry)
+                self._conn.commit()
+            except Exception as e:
+                self._conn.rollback()
+                logger.error(f"Error saving log entries: {e}")
+                return
+
+            for entry in written:
+                self._update_counters(entry.get('status'), 1)
+            if written:
+                self.last_modified = datetime.now(timezone.utc)
+
+            # Roll the window forward the first time we log on a new day
+            if self._current_cutoff() != self._retention_cutoff:
+                self.rotate()
+
+        if written and self.on_commit:
+            try:
+                self.on_commit(self.current_change())
+            except Exception as e:
+                logger.error(f"Error in auth log commit callback: {e}")
+
+    def _current_cutoff(self):
+        return (datetime.now().date() - timedelta(days=self.retention_days)).isoformat()
+
+    def _segment_path(self, day):
+        return os.path.join(self.archive_dir, day + ARCHIVE_SUFFIX)
+
+    def _scan_archive_dir(self):
+        if not self.archive_dir or not os.path.isdir(self.archive_dir):
+            self._archive_days = []
+            return
+        self._archive_days = sorted(
+            name[:-len(ARCHIVE_SUFFIX)] for name in os.listdir(self.archive_dir) if name.endswith(ARCHIVE_SUFFIX)
+        )
+
+    def _read_segment(self, day):
+        """Return the (seq, AuthLogRecord) pairs archived for a day.
+
+        The most recently used days stay decoded in memory, so paging through
+        an archived day does not decompress it again for every page.
+        """
+        records = self._segment_cache.get(day)
+        if records is not None:
+            self._segment_cache.move_to_end(day)
+            return records
+
+        records = []
+        try:
+            with gzip.open(self._segment_path(day), 'rt') as file:
+                for line in file:
+                    record = json.loads(line)
+                    records.append((record['seq'], AuthLogRecord(record['entry'])))
+        except FileNotFoundError:
+            return records
+        except Exception as e:
+            logger.error(f"Error reading archive segment for {day}: {e}")
+            return records
+
+        self._segment_cache[day] = records
+        if len(self._segment_cache) > SEGMENT_CACHE_SIZE:
+            self._segment_cache.popitem(last=False)
+        return records
+
+    def _write_segment(self, day, records):
+        """Merge records into a day's segment, replacing the file atomically."""
+        merged = {seq: record.to_entry() for seq, record in self._read_segment(day)}
+        merged.update(records)
+        self._replace_segment(day, merged)
+
+    def _replace_segment(self, day, entries):
+        """Atomically replace a day's segment with ``entries`` ({seq: entry}); an empty day is removed."""
+        self._segment_cache.pop(day, None)
+        path = self._segment_path(day)
+        if not entries:
+            os.remove(path)
+            return
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as raw_file:
+            with gzip.GzipFile(fileobj=raw_file, mode='wb') as file:
+                for seq in sorted(entries):
+                    file.write((json.dumps({'seq': seq, 'entry': entries[seq]}) + '\n').encode('utf-8'))
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+        os.replace(temp_path, path)
+
+    def _match_archive(self, ids, older_than, status, method):
+        """Find archived entries meeting delete_many()'s criteria.
+
+        Returns:
+            dict: day -> [(seq, AuthLogRecord)] for the days with matches
+        """
+        matches = {}
+        for day in self._archive_days:
+            if older_than and day > older_than[:10]:
+                break
+            found = [
+                (seq, record) for seq, record in self._read_segment(day)
+                if (ids is None or record.id in ids)
+                and (not older_than or record.timestamp < older_than)
+                and (not status or record.status == status)
+                and (not method or record.method == method)
+            ]
+            if found:
+                matches[day] = found
+        return matches
+
+    def _archive_days_in_range(self, start, end):
+        return [day for day in self._archive_days
+                if (not start or day >= start[:10]) and (not end or day <= end[:10])]
+
+    def _query_archive(self, limit, before_key, status, method, start, end, search):
+        """Scan archive segments newest day first for up to ``limit`` matching entries."""
+        upper = before_key[0] if before_key else None
+        results = []
+        for day in reversed(self._archive_days_in_range(start, upper if upper and (not end or upper < end) else end)):
+            matches = [
+                (record.timestamp, seq, record) for seq, record in self._read_segment(day)
+                if self._matches(record, status, method, start, end, search)
+                and (not before_key or (record.timestamp, seq) < before_key)
+            ]
+            matches.sort(key=lambda result: (result[0], result[1]), reverse=True)
+            results += matches
+            # Days are disjoint, so once a whole day fills the page we can stop
+            if len(results) >= limit:
+                break
+        return [(timestamp, seq, record.to_entry()) for timestamp, seq, record in results[:limit]]
+
+    @staticmethod
+    def _matches(entry, status, method, start, end, search):
+        """Python equivalent of _build_filters() for entries and archived records."""
+        timestamp = entry.get('timestamp', '')
+        if status and entry.get('status') != status:
+            return False
+        if method and entry.get('method') != method:
+            return False
+        if start and timestamp < start:
+            return False
+        if end and timestamp > end:
+            return False
+        if search:
+            needle = search.lower()
+            if not any(needle in (entry.get(key) or '').lower() for key in ('user', 'location', 'details')):
+                return False
+        return True
+
+    @staticmethod
+    def _is_day_aligned(start, end):
+        return ((not start or len(start) == 10) and
+                (not end or len(end) == 10 or end.endswith('T23:59:59.999999')))
+
+    def _record_change(self, op, log_id):
+        cursor = self._conn.execute('INSERT INTO auth_log_changes (op, log_id) VALUES (?, ?)', (op, log_id))
+        # Trim the feed now and then rather than on every write
+        if cursor.lastrowid % 1000 == 0:
+            self._conn.execute('DELETE FROM auth_log_changes WHERE change <= ?',
+                               (cursor.lastrowid - CHANGE_RETENTION,))
+
+    def _create_schema(self):
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS auth_logs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                timestamp TEXT NOT NULL,
+                user TEXT,
+                location TEXT,
+                status TEXT,
+                message TEXT,
+                details TEXT,
+                method TEXT,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_auth_logs_timestamp ON auth_logs (timestamp);
+            CREATE INDEX IF NOT EXISTS idx_auth_logs_status ON auth_logs (status, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_auth_logs_method ON auth_logs (method, timestamp);
+            CREATE TABLE IF NOT EXISTS auth_log_changes (
+                change INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                log_id TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS auth_log_rollups (
+                day TEXT NOT NULL,
+                hour INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                method TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                PRIMARY KEY (day, hour, status, method)
+            );
+        ''')
+
+    def _import_old_logs(self):
+        """Import entries from the NDJSON journal, or failing that the legacy JSON file."""
+        entries = None
+        if self.journal_path and os.path.exists(self.journal_path):
+            entries = self._read_journal(self.journal_path)
+            source = self.journal_path
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            try:
+                with open(self.legacy_path, 'r') as file:
+                    entries = json.load(file)
+                source = self.legacy_path
+            except json.JSONDecodeError:
+                logger.error(f"Error decoding JSON from {self.legacy_path}")
+            except Exception as e:
+                logger.error(f"Error loading logs: {e}")
+
+        if not entries:
+            return
+
+        # Import oldest first so seq order follows the original order
+        for entry in entries:
+            try:
+                self._insert(entry)
+            except sqlite3.IntegrityError:
+                logger.warning(f"Skipping duplicate log entry {entry.get('id')}")
+        logger.info(f"Imported {len(entries)} log entries from {source}")
+
+    @staticmethod
+    def _read_journal(path):
+        """Replay an NDJSON add/delete journal into a list of live entries."""
+        entries = {}
+        with open(path, 'rb') as file:
+            for raw_line in file:
+                line = raw_line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Corrupt or torn record from a crash mid-append
+                    logger.warning(f"Skipping unreadable record in {path}")
+                    continue
+                if record.get('op') == 'add':
+                    entry = record.get('entry', {})
+                    entries[entry.get('id')] = entry
+                elif record.get('op') == 'delete':
+                    entries.pop(record.get('id'), None)
+        return list(entries.values())
+
+    def _insert(self, entry):
+        extra = {key: value for key, value in entry.items() if key not in ENTRY_COLUMNS}
+        self._conn.execute(
+            'INSERT INTO auth_logs (id, timestamp, user, location, status, message, details, method, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [entry.get(column) for column in ENTRY_COLUMNS] + [json.dumps(extra) if extra else None]
+        )
+        self._update_rollup(entry.get('timestamp'), entry.get('status'), entry.get('method'), 1)
+
+    @staticmethod
+    def _build_filters(status, method, start, end, search):
+        clauses = []
+        params = []
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if method:
+            clauses.append('method = ?')
+            params.append(method)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp <= ?')
+            params.append(end)
+        if search:
+            pattern = f"%{search}%"
+            clauses.append('(user LIKE ? OR location LIKE ? OR details LIKE ?)')
+            params += [pattern, pattern, pattern]
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        return where, params
+
+    @staticmethod
+    def _row_to_entry(row):
+        entry = {column: row[column] for column in ENTRY_COLUMNS if row[column] is not None}
+        if row['extra']:
+            entry.update(json.loads(row['extra']))
+        return entry
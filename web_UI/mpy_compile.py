@@ -0,0 +1,138 @@
+"""
+MicroPython Bytecode Compilation
+--------------------------------
+Cross-compiles the Pico's Python modules to ``.mpy`` bytecode on the host,
+so the Pico imports ready-made bytecode instead of compiling the source
+itself at every start (which costs time before "System ready" and heap on
+the RP2040).
+
+Compiled files are cached by the SHA-256 of their source, so a module is
+only recompiled when it changes. ``mpy-cross`` is optional: it is looked up
+on PATH (``pip install mpy-cross``) or at ``$MPY_CROSS``. Without it, or when
+the bytecode version it produces does not match the Pico's firmware, the
+source file is deployed as before.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+
+from pico_link import file_sha256
+
+logger = logging.getLogger("MFALock")
+
+# Compiled modules, named <source sha256>.mpy
+MPY_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mpy_cache")
+COMPILE_TIMEOUT = 30  # seconds
+
+# `mpy-cross --version` output per executable
+_mpy_cross_versions = {}
+# (mpy-cross version, Pico bytecode version) pairs known not to match, so a
+# mismatched Pico gets its source straight away on later connects
+_incompatible_versions = set()
+
+
+def find_mpy_cross():
+    """Return the mpy-cross executable, or None if it is not installed."""
+    return os.getenv("MPY_CROSS") or shutil.which("mpy-cross")
+
+
+def mpy_cross_version(mpy_cross):
+    """Return ``mpy-cross --version`` for an executable (cached), or None if it cannot be run."""
+    if mpy_cross not in _mpy_cross_versions:
+        try:
+            result = subprocess.run([mpy_cross, "--version"], capture_output=True,
+                                    text=True, timeout=COMPILE_TIMEOUT)
+            _mpy_cross_versions[mpy_cross] = result.stdout.strip() or None
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"Error running {mpy_cross} --version: {e}")
+            _mpy_cross_versions[mpy_cross] = None
+    return _mpy_cross_versions[mpy_cross]
+
+
+def compile_module(source_path, remote_name, cache_dir=MPY_CACHE_DIR, force=False):
+    """Compile a module to .mpy, reusing the cached file if the source is unchanged.
+
+    Args:
+        source_path: the module's source on the host
+        remote_name: the source file name on the Pico, shown in tracebacks
+        force: recompile even if a cached file exists
+
+    Returns:
+        str or None: path of the .mpy file, or None if it could not be built
+    """
+    mpy_path = os.path.join(cache_dir, f"{file_sha256(source_path)}.mpy")
+    if os.path.exists(mpy_path) and not force:
+        return mpy_path
+
+    mpy_cross = find_mpy_cross()
+    if mpy_cross is None:
+        logger.info("mpy-cross not found; deploying Python source")
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_path = f"{mpy_path}.{os.getpid()}.tmp"
+    try:
+        result = subprocess.run(
+            [mpy_cross, "-o", temp_path, "-s", remote_name, source_path],
+            capture_output=True, text=True, timeout=COMPILE_TIMEOUT
+        )
+        if result.returncode != 0:
+            logger.error(f"mpy-cross failed for {source_path}: {result.stderr.strip()}")
+            return None
+        os.replace(temp_path, mpy_path)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.error(f"Error running mpy-cross on {source_path}: {e}")
+        return None
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    logger.info(f"Compiled {source_path} to {mpy_path}")
+    return mpy_path
+
+
+def mpy_compatible(mpy_path, device_mpy):
+    """Check a .mpy file's header against the Pico's ``sys.implementation._mpy``.
+
+    Bytecode-only .mpy files load on any architecture; the bytecode version
+    and sub-version must match the firmware's.
+    """
+    if device_mpy is None:
+        # Firmware too old to report its version; don't guess
+        return False
+    try:
+        with open(mpy_path, 'rb') as file:
+            header = file.read(4)
+    except OSError:
+        return False
+    return (len(header) == 4 and header[0] == ord('M')
+            and header[1] == device_mpy & 0xFF
+            and header[2] & 0x03 == (device_mpy >> 8) & 0x03)
+
+
+def module_files(source_path, module_name, device_mpy):
+    """Choose the file to deploy for a module: bytecode if possible, otherwise source.
+
+    Returns:
+        tuple: ({remote path: local path} to deploy, remote path to delete).
+        The Pico imports a .py in preference to a .mpy of the same name, so
+        the form not being deployed has to go.
+    """
+    source_name = f"{module_name}.py"
+    mpy_name = f"{module_name}.mpy"
+    mpy_cross = find_mpy_cross()
+    versions = (mpy_cross_version(mpy_cross) if mpy_cross else None, device_mpy)
+    if versions in _incompatible_versions:
+        return {source_name: source_path}, mpy_name
+
+    mpy_path = compile_module(source_path, source_name)
+    if mpy_path is not None and not mpy_compatible(mpy_path, device_mpy) and device_mpy is not None:
+        # Cached by an older mpy-cross, perhaps; the installed one may match
+        mpy_path = compile_module(source_path, source_name, force=True)
+    if mpy_path is not None and mpy_compatible(mpy_path, device_mpy):
+        return {mpy_name: mpy_path}, source_name
+    if mpy_path is not None:
+        logger.warning(f"Compiled {mpy_name} does not match the Pico's bytecode version; deploying source")
+        _incompatible_versions.add(versions)
+    return {source_name: source_path}, mpy_name
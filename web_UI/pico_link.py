@@ -0,0 +1,409 @@
+"""
+Pico Link
+---------
+One persistent USB serial connection to the Raspberry Pi Pico.
+
+The web server used to spawn an ``mpremote`` process for every operation
+(listing devices, removing and copying files, running code, watching the
+output), paying interpreter startup and USB re-enumeration each time.
+PicoLink opens the Pico's USB CDC port once and keeps MicroPython in its raw
+REPL, where three kinds of traffic share the link:
+
+- Output of the sensor program, which runs on a background thread on the
+  Pico, is split into lines and handed out by readline().
+- Commands (exec() / eval()) are raw-REPL requests, sent one at a time. The
+  raw REPL frames each response (``OK`` <stdout> ``\\x04`` <stderr> ``\\x04``
+  ``>``), so the reader thread can tell the response apart from the event
+  stream and hand it to the waiting caller, or fail it after a timeout.
+- File transfers are a series of small commands that write the file in
+  chunks. deploy() first asks the Pico for the SHA-256 of the files it
+  already has and only sends the ones whose content differs, so reconnecting
+  with unchanged files costs a single round trip.
+
+Sensor output printed while a command runs lands inside the command's
+stdout; it is still passed on to readline(). eval() tags its result line so
+it is never mistaken for sensor output.
+"""
+
+import ast
+import time
+import hashlib
+import queue
+import logging
+import threading
+
+import serial
+from serial.tools import list_ports
+
+logger = logging.getLogger("MFALock")
+
+# USB vendor/product ID of a Pico running MicroPython
+PICO_USB_VID = 0x2E8A
+PICO_USB_PID = 0x0005
+DEFAULT_BAUDRATE = 115200
+DEFAULT_TIMEOUT = 5.0  # seconds to wait for a command's response
+# Lines of sensor output kept for readline(); the oldest are dropped beyond this
+LINE_QUEUE_SIZE = 1000
+# Bytes of file content sent per command when copying a file
+FILE_CHUNK_SIZE = 1024
+# The Pico's USB input buffer is small; commands are written in pieces
+WRITE_CHUNK_SIZE = 256
+
+_RAW_REPL_BANNER = b"raw REPL; CTRL-B to exit\r\n>"
+# Prefix of the line eval() prints its result on
+_RESULT_TAG = '\x1e'
+
+# Defines _sha256_files(paths) in the raw REPL: {path: hex digest, or None if missing}
+_DEVICE_HASH_CODE = (
+    "def _sha256_files(paths):\n"
+    "    import hashlib, binascii\n"
+    "    hashes = {}\n"
+    "    for path in paths:\n"
+    "        try:\n"
+    "            digest = hashlib.sha256()\n"
+    "            with open(path, 'rb') as file:\n"
+    "                while True:\n"
+    "                    chunk = file.read(512)\n"
+    "                    if not chunk:\n"
+    "                        break\n"
+    "                    digest.update(chunk)\n"
+    "            hashes[path] = binascii.hexlify(digest.digest()).decode()\n"
+    "        except OSError:\n"
+    "            hashes[path] = None\n"
+    "    return hashes\n"
+)
+
+# Response framing, as (marker, where the bytes before it go)
+_ENTER_RAW_REPL = [(_RAW_REPL_BANNER, 'lines')]
+_SOFT_RESET = [(b"OK", 'lines'), (_RAW_REPL_BANNER, None)]
+_EXEC = [(b"OK", 'lines'), (b"\x04", 'stdout'), (b"\x04", 'stderr'), (b">", 'lines')]
+
+
+class PicoLinkError(Exception):
+    """The link is down, a command timed out, or a command raised on the Pico."""
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a local file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_pico_port():
+    """Return the serial device of the first attached Pico, or None."""
+    for port in list_ports.comports():
+        if port.vid == PICO_USB_VID and port.pid == PICO_USB_PID:
+            return port.device
+    return None
+
+
+class _Request:
+    """A command waiting for its response."""
+
+    __slots__ = ('steps', 'stdout', 'stderr', 'results', 'done')
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        self.stdout = ''
+        self.stderr = ''
+        self.results = []
+        self.done = threading.Event()
+
+
+class PicoLink:
+    """A persistent raw-REPL connection to the Pico."""
+
+    def __init__(self, port=None, baudrate=DEFAULT_BAUDRATE):
+        self.port = port
+        self.baudrate = baudrate
+        self._serial = None
+        self._reader = None
+        self._running = False
+        self._lock = threading.Lock()  # Guards the buffers and the pending request
+        self._request_lock = threading.Lock()  # One command at a time
+        self._close_lock = threading.Lock()
+        self._request = None
+        self._buffer = bytearray()  # Received bytes not yet matched to a response
+        self._line_buffer = bytearray()  # Sensor output not yet split into lines
+        self._lines = queue.Queue(maxsize=LINE_QUEUE_SIZE)
+        self.lines_received = 0
+        self.lines_dropped = 0
+
+    @property
+    def connected(self):
+        return self._running and self._serial is not None
+
+    def open(self, soft_reset=True, timeout=DEFAULT_TIMEOUT):
+        """Open the serial port and switch the Pico to the raw REPL.
+
+        Args:
+            soft_reset: restart MicroPython first, stopping any program left
+                running by an earlier session
+
+        Raises:
+            PicoLinkError: if no Pico is found or it does not respond
+        """
+        port = self.port or find_pico_port()
+        if port is None:
+            raise PicoLinkError("No Pico found")
+        try:
+            # The short read timeout lets the reader thread notice close()
+            self._serial = serial.Serial(port, self.baudrate, timeout=0.1)
+        except serial.SerialException as e:
+            raise PicoLinkError(f"Could not open {port}: {e}") from e
+        self.port = port
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, name="PicoLinkReader", daemon=True)
+        self._reader.start()
+
+        try:
+            # Interrupt anything running in the REPL, then enter the raw REPL
+            self._transact(b"\r\x03\x03\x01", _ENTER_RAW_REPL, timeout)
+            if soft_reset:
+                self._transact(b"\x04", _SOFT_RESET, timeout)
+        except PicoLinkError:
+            self.close()
+            raise
+        logger.info(f"Pico link open on {port}")
+
+    def close(self):
+        """Return the Pico to the normal REPL and close the port."""
+        with self._close_lock:
+            if self._serial is None:
+                return
+            if self._running:
+                try:
+                    self._serial.write(b"\x02")
+                except serial.SerialException:
+                    pass
+            self._running = False
+            if self._reader is not None and self._reader is not threading.current_thread():
+                self._reader.join()
+            self._reader = None
+            try:
+                self._serial.close()
+            except serial.SerialException:
+                pass
+            self._serial = None
+        logger.info(f"Pico link on {self.port} closed")
+
+    def stats(self):
+        """Counters for the sensor output stream."""
+        return {
+            'queue_depth': self._lines.qsize(),
+            'queue_size': LINE_QUEUE_SIZE,
+            'lines_received': self.lines_received,
+            'lines_dropped': self.lines_dropped,
+        }
+
+    def readline(self, timeout=None):
+        """Return the next line of sensor output, or None after ``timeout`` seconds."""
+        try:
+            return self._lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def exec(self, code, timeout=DEFAULT_TIMEOUT):
+        """Run code on the Pico and return what it printed.
+
+        Raises:
+            PicoLinkError: on timeout, or with the last traceback line if the
+                code raised
+        """
+        return self._exec(code, timeout).stdout
+
+    def eval(self, expression, timeout=DEFAULT_TIMEOUT):
+        """Evaluate an expression on the Pico and return its value.
+
+        The value must be a Python literal (numbers, strings, bytes, bools,
+        None, and lists/tuples/dicts of those).
+        """
+        request = self._exec(f"print({_RESULT_TAG!r} + repr({expression}))", timeout)
+        if not request.results:
+            raise PicoLinkError(f"No result from {expression}")
+        try:
+            return ast.literal_eval(request.results[-1])
+        except (ValueError, SyntaxError) as e:
+            raise PicoLinkError(f"Could not parse result of {expression}: {e}") from e
+
+    def put_file(self, local_path, remote_path, timeout=DEFAULT_TIMEOUT):
+        """Copy a file to the Pico's filesystem, replacing any existing file."""
+        with open(local_path, 'rb') as file:
+            data = file.read()
+        self._exec(f"_f = open({remote_path!r}, 'wb')", timeout)
+        try:
+            for offset in range(0, len(data), FILE_CHUNK_SIZE):
+                self._exec(f"_f.write({data[offset:offset + FILE_CHUNK_SIZE]!r})", timeout)
+        finally:
+            self._exec("_f.close()\ndel _f", timeout)
+        logger.info(f"Copied {local_path} to Pico:{remote_path} ({len(data)} bytes)")
+
+    def mpy_version(self, timeout=DEFAULT_TIMEOUT):
+        """The firmware's ``sys.implementation._mpy`` (bytecode version), or None if it has none."""
+        return self.eval("getattr(__import__('sys').implementation, '_mpy', None)", timeout)
+
+    def file_hashes(self, remote_paths, timeout=DEFAULT_TIMEOUT):
+        """Return {path: hex SHA-256} for files on the Pico; None for missing files."""
+        self._exec(_DEVICE_HASH_CODE, timeout)
+        return self.eval(f"_sha256_files({list(remote_paths)!r})", timeout)
+
+    def deploy(self, files, timeout=DEFAULT_TIMEOUT):
+        """Copy files to the Pico, skipping those whose content is already there.
+
+        Args:
+            files (dict): remote path -> local path
+
+        Returns:
+            list: the remote paths that were copied
+        """
+        try:
+            device_hashes = self.file_hashes(files, timeout)
+        except PicoLinkError as e:
+            # E.g. firmware without hashlib: copy everything
+            logger.warning(f"Could not read file hashes from Pico, copying all files: {e}")
+            device_hashes = {}
+
+        copied = []
+        for remote_path, local_path in files.items():
+            if device_hashes.get(remote_path) == file_sha256(local_path):
+                logger.info(f"Pico:{remote_path} is up to date")
+                continue
+            self.put_file(local_path, remote_path, timeout)
+            copied.append(remote_path)
+        return copied
+
+    def remove(self, remote_path, timeout=DEFAULT_TIMEOUT):
+        """Delete a file on the Pico; a missing file is not an error."""
+        self._exec(
+            f"import os\n"
+            f"try:\n"
+            f"    os.remove({remote_path!r})\n"
+            f"except OSError:\n"
+            f"    pass\n",
+            timeout
+        )
+
+    def reset(self):
+        """Hard-reset the Pico and close the link; the port disappears while it reboots."""
+        with self._request_lock:
+            if self.connected:
+                try:
+                    self._write(b"import machine\nmachine.reset()\x04")
+                except PicoLinkError as e:
+                    logger.warning(f"Error resetting Pico: {e}")
+        self.close()
+
+    def _exec(self, code, timeout):
+        request = self._transact(code.encode() + b"\x04", _EXEC, timeout)
+        if request.stderr:
+            raise PicoLinkError(request.stderr.strip().splitlines()[-1])
+        return request
+
+    def _transact(self, payload, steps, timeout):
+        with self._request_lock:
+            request = _Request(steps)
+            with self._lock:
+                if not self.connected:
+                    raise PicoLinkError("Pico link is not open")
+                self._request = request
+            try:
+                self._write(payload)
+                if not request.done.wait(timeout):
+                    raise PicoLinkError(f"Pico did not respond within {timeout}s")
+            finally:
+                with self._lock:
+                    if self._request is request:
+                        # Whatever arrived is not a response after all
+                        self._request = None
+                        self._line_buffer += self._buffer
+                        self._buffer.clear()
+                        self._split_lines()
+            return request
+
+    def _write(self, payload):
+        try:
+            for offset in range(0, len(payload), WRITE_CHUNK_SIZE):
+                self._serial.write(payload[offset:offset + WRITE_CHUNK_SIZE])
+                if len(payload) > WRITE_CHUNK_SIZE:
+                    time.sleep(0.01)
+        except (serial.SerialException, AttributeError) as e:
+            raise PicoLinkError(f"Error writing to Pico: {e}") from e
+
+    def _read_loop(self):
+        while self._running:
+            try:
+                data = self._serial.read(self._serial.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError) as e:
+                if self._running:
+                    logger.error(f"Pico link on {self.port} lost: {e}")
+                self._running = False
+                break
+            if data:
+                with self._lock:
+                    self._feed(data)
+
+    def _feed(self, data):
+        self._buffer += data
+        request = self._request
+        while request is not None and request.steps:
+            marker, sink = request.steps[0]
+            index = self._buffer.find(marker)
+            if index < 0:
+                return
+            text = self._buffer[:index]
+            del self._buffer[:index + len(marker)]
+            request.steps.pop(0)
+
+            if sink == 'lines':
+                self._line_buffer += text
+                self._split_lines()
+            elif sink == 'stdout':
+                self._take_stdout(request, text.decode('utf-8', errors='replace'))
+            elif sink == 'stderr':
+                request.stderr = text.decode('utf-8', errors='replace')
+
+        if request is not None:
+            self._request = None
+            request.done.set()
+        # Between commands everything is sensor output
+        self._line_buffer += self._buffer
+        self._buffer.clear()
+        self._split_lines()
+
+    def _take_stdout(self, request, text):
+        output = []
+        for line in text.replace('\r', '').split('\n'):
+            if line.startswith(_RESULT_TAG):
+                request.results.append(line[len(_RESULT_TAG):])
+            else:
+                output.append(line)
+                self._put_line(line)
+        request.stdout = '\n'.join(output)
+
+    def _split_lines(self):
+        while True:
+            index = self._line_buffer.find(b'\n')
+            if index < 0:
+                return
+            line = self._line_buffer[:index].decode('utf-8', errors='replace')
+            del self._line_buffer[:index + 1]
+            self._put_line(line)
+
+    def _put_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+        self.lines_received += 1
+        try:
+            self._lines.put_nowait(line)
+        except queue.Full:
+            # Nobody is reading; keep the newest output
+            try:
+                self._lines.get_nowait()
+                self.lines_dropped += 1
+            except queue.Empty:
+                pass
+            self._lines.put_nowait(line)
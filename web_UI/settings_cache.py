@@ -0,0 +1,229 @@
+"""
+Settings Cache
+--------------
+Shared, change-aware access to ``web_UI/settings.json``.
+
+Every component that reads the settings (the web server, the LCD/keypad
+controller, the voice phrase generator) goes through a SettingsCache instead
+of opening and parsing the file itself. The parsed settings are kept in
+memory and revalidated with a single ``os.stat()``: the file is only parsed
+again when its modification time, size or inode changes, e.g. after another
+process saved it.
+
+Writes go through ``update()``, which merges the changes under a lock (a
+thread lock plus an ``flock`` on ``settings.json.lock``, so the web server and
+the LCD process never interleave read-modify-write cycles), bumps the
+``revision`` number stored in the file, and replaces the file atomically via
+a temp file and rename. Readers never see a half-written file. ``update()``
+returns the keys whose values actually changed, so callers only act on real
+changes.
+
+Whenever the content changes, by whichever process, subscribers are called
+with the new settings and the set of keys that changed. ``start_watching()``
+runs that check on a background thread, so long-running processes pick up
+edits without polling the file themselves or restarting.
+
+Only the standard library is used, so the module can be imported from any
+component by adding ``web_UI`` to ``sys.path``.
+"""
+
+import os
+import json
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not on Windows; writes are then only serialized within one process
+
+logger = logging.getLogger("MFALock")
+
+# settings.json lives next to this module
+SETTINGS_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
+
+# How often the watcher thread checks the file
+DEFAULT_WATCH_INTERVAL = 1.0  # seconds
+
+# Key holding the settings revision, bumped by every update()
+REVISION_KEY = 'revision'
+
+
+class SettingsCache:
+    """In-memory copy of a settings file, re-parsed only when the file changes."""
+
+    def __init__(self, path=SETTINGS_FILE_PATH, defaults=None):
+        self.path = path
+        self.defaults = dict(defaults or {})
+        self._lock = threading.RLock()
+        self._settings = None
+        self._stamp = None
+        self._subscribers = []
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def get(self, key=None, default=None):
+        """Return the current settings, or one value from them.
+
+        The returned dict is a copy; change the file (or go through the web
+        server) to change the settings.
+        """
+        with self._lock:
+            self._revalidate()
+            if key is None:
+                return dict(self._settings)
+            return self._settings.get(key, default)
+
+    @property
+    def revision(self):
+        """The revision stored in the file; 0 until the first update()."""
+        return self.get(REVISION_KEY, 0)
+
+    def update(self, changes):
+        """Merge ``changes`` into the settings file atomically.
+
+        Values equal to the current ones are not written; if nothing differs
+        the file is left alone and the revision stays the same.
+
+        Returns:
+            set: the keys whose values changed
+
+        Raises:
+            OSError: if the file could not be written
+        """
+        changes = {key: value for key, value in changes.items() if key != REVISION_KEY}
+        with self._lock, self._file_lock():
+            # Start from the latest file, which another process may have just written
+            self._revalidate()
+            current = dict(self._settings)
+            changed = {key for key, value in changes.items() if key not in current or current[key] != value}
+            if not changed:
+                return changed
+
+            current.update(changes)
+            current[REVISION_KEY] = current.get(REVISION_KEY, 0) + 1
+            self._write_atomic(current)
+            self._revalidate()
+        logger.info(f"Settings saved to {self.path} (revision {current[REVISION_KEY]})")
+        return changed
+
+    def reload(self):
+        """Check the file now; returns True if the settings changed."""
+        with self._lock:
+            return self._revalidate()
+
+    def subscribe(self, callback):
+        """Call ``callback(settings, changed_keys)`` whenever the settings change."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start_watching(self, interval=DEFAULT_WATCH_INTERVAL):
+        """Start a daemon thread that reloads the settings when the file changes."""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,),
+                                         name="SettingsWatcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join()
+        self._watcher = None
+
+    def _watch_loop(self, interval):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Error checking {self.path} for changes: {e}")
+
+    def _file_lock(self):
+        return _FileLock(self.path + '.lock')
+
+    def _write_atomic(self, settings):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as file:
+                json.dump(settings, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _revalidate(self):
+        """Re-parse the file if its stamp changed. Returns True if the settings changed."""
+        stamp = self._file_stamp()
+        if self._settings is not None and stamp == self._stamp:
+            return False
+
+        if stamp is None:
+            loaded = dict(self.defaults)
+        else:
+            try:
+                with open(self.path, 'r') as file:
+                    loaded = json.load(file)
+                if not isinstance(loaded, dict):
+                    raise ValueError("top level is not an object")
+            except (OSError, ValueError) as e:
+                # A half-written or corrupt file: keep what we had and try again next time
+                logger.error(f"Error loading settings from {self.path}: {e}")
+                if self._settings is None:
+                    self._settings = dict(self.defaults)
+                return False
+        self._stamp = stamp
+
+        previous = self._settings
+        if previous == loaded:
+            return False
+        self._settings = loaded
+        if previous is None:
+            return True
+
+        changed = {key for key in previous.keys() | loaded.keys()
+                   if key != REVISION_KEY and previous.get(key) != loaded.get(key)}
+        logger.info(f"Settings changed (revision {loaded.get(REVISION_KEY, 0)}): {', '.join(sorted(changed))}")
+        for callback in list(self._subscribers):
+            try:
+                callback(dict(loaded), changed)
+            except Exception as e:
+                logger.error(f"Error in settings subscriber: {e}")
+        return True
+
+
+class _FileLock:
+    """Exclusive ``flock`` on a lock file, held for the duration of a with block."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
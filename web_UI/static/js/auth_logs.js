@@ -1,81 +1,101 @@
 // Authentication logs specific JavaScript
 
+// Number of log entries fetched per page
+const LOGS_PAGE_SIZE = 50;
+
+// Filters applied to the current listing and the cursor for the next page
+let currentLogFilters = {};
+let nextLogsCursor = null;
+
+// Change-feed cursor for delta sync; null until the first page has loaded
+let logsSyncCursor = null;
+let logsSyncInFlight = false;
+let logsSyncPending = false;
+
 document.addEventListener('DOMContentLoaded', function() {
-    // Fetch log data from the server and populate the table
-    fetch('/api/logs')
-        .then(response => response.json())
-        .then(data => {
-            // Sort logs by timestamp in descending order (newest first)
-            const sortedLogs = data.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-            populateLogs(sortedLogs);
-
-            // Set today's date as default end date
-            const today = new Date();
-            const endDateInput = document.getElementById('end-date');
-            endDateInput.valueAsDate = today;
-
-            // Set one week ago as default start date
-            const oneWeekAgo = new Date();
-            oneWeekAgo.setDate(oneWeekAgo.getDate() - 7);
-            const startDateInput = document.getElementById('start-date');
-            startDateInput.valueAsDate = oneWeekAgo;
-            
-            // Add responsive classes for mobile
-            addResponsiveListeners();
-        })
-        .catch(error => {
-            console.error('Error fetching logs:', error);
-        });
+    // Fetch the first page of logs from the server and populate the table
+    loadLogs();
+
+    // Set today's date as default end date
+    const today = new Date();
+    const endDateInput = document.getElementById('end-date');
+    endDateInput.valueAsDate = today;
+
+    // Set one week ago as default start date
+    const oneWeekAgo = new Date();
+    oneWeekAgo.setDate(oneWeekAgo.getDate() - 7);
+    const startDateInput = document.getElementById('start-date');
+    startDateInput.valueAsDate = oneWeekAgo;
+
+    // Add responsive classes for mobile
+    addResponsiveListeners();
 
     // Filter logs by search term and date range
     document.getElementById('filter-button').addEventListener('click', () => {
-        const searchTerm = document.getElementById('log-search').value.toLowerCase();
-        const startDate = document.getElementById('start-date').valueAsDate;
-        const endDate = document.getElementById('end-date').valueAsDate;
+        // Date inputs give YYYY-MM-DD; the server treats a bare "to" date as the whole day
+        currentLogFilters = {
+            search: document.getElementById('log-search').value,
+            from: document.getElementById('start-date').value,
+            to: document.getElementById('end-date').value
+        };
+        loadLogs();
+    });
+
+    // Select or clear every row currently shown
+    document.getElementById('select-all-logs').addEventListener('change', event => {
+        document.querySelectorAll('#log-table-body .log-select').forEach(checkbox => {
+            checkbox.checked = event.target.checked;
+        });
+        updateDeleteSelectedButton();
+    });
 
-        // Set end date to end of day
-        if (endDate) {
-            endDate.setHours(23, 59, 59, 999);
+    // Delete all selected rows with a single request
+    document.getElementById('delete-selected-button').addEventListener('click', () => {
+        const ids = Array.from(document.querySelectorAll('#log-table-body .log-select:checked'))
+            .map(checkbox => checkbox.closest('tr').dataset.logId);
+        if (ids.length === 0 || !confirm(`Are you sure you want to delete ${ids.length} logs?`)) {
+            return;
         }
 
-        // Fetch logs again and apply filters
-        fetch('/api/logs')
+        fetch('/api/logs', {
+            method: 'DELETE',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids: ids })
+        })
             .then(response => response.json())
             .then(data => {
-                const filteredLogs = data.filter(log => {
-                    const logTimestamp = new Date(log.timestamp);
-
-                    const matchesSearch = !searchTerm ||
-                        log.user.toLowerCase().includes(searchTerm) ||
-                        log.location.toLowerCase().includes(searchTerm) ||
-                        log.details.toLowerCase().includes(searchTerm);
-
-                    const matchesDateRange = (!startDate || logTimestamp >= startDate) &&
-                                             (!endDate || logTimestamp <= endDate);
-
-                    return matchesSearch && matchesDateRange;
-                }).sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-
-                populateLogs(filteredLogs);
+                if (data.status === 'success') {
+                    data.deleted.forEach(removeLogRow);
+                    document.getElementById('select-all-logs').checked = false;
+                    updateDeleteSelectedButton();
+                    showNotification(data.message, 'success');
+                } else {
+                    showNotification(`Error: ${data.message}`, 'error');
+                }
             })
             .catch(error => {
-                console.error('Error fetching logs:', error);
+                console.error('Error deleting logs:', error);
+                showNotification('An error occurred while deleting the logs.', 'error');
             });
     });
 
-    // Listen for real-time auth events
+    // Download every log matching the current filters; the server streams the file
+    document.getElementById('export-button').addEventListener('click', () => {
+        window.location.href = `/api/logs/export?${buildLogsQuery({ format: 'csv' })}`;
+    });
+
+    // Fetch the next page of older logs
+    document.getElementById('load-more-button').addEventListener('click', () => {
+        if (nextLogsCursor) {
+            loadLogs(nextLogsCursor);
+        }
+    });
+
+    // Sync when new entries are committed or deleted elsewhere. auth_event
+    // arrives before the entry is committed, so it is not used here.
     if (typeof socket !== 'undefined') {
-        socket.on('auth_event', function(data) {
-            // Fetch logs again to reflect the new event
-            fetch('/api/logs')
-                .then(response => response.json())
-                .then(data => {
-                    const sortedLogs = data.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                    populateLogs(sortedLogs);
-                })
-                .catch(error => {
-                    console.error('Error fetching logs:', error);
-                });
+        socket.on('logs_changed', function(data) {
+            syncLogs();
         });
     }
     
@@ -87,100 +107,137 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Give browser time to repaint before potentially re-populating logs
                 const tableBody = document.getElementById('log-table-body');
                 if (tableBody.children.length > 0) {
-                    fetch('/api/logs')
-                        .then(response => response.json())
-                        .then(data => {
-                            const sortedLogs = data.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                            populateLogs(sortedLogs);
-                        })
-                        .catch(error => {
-                            console.error('Error refreshing logs after orientation change:', error);
-                        });
+                    loadLogs();
                 }
             }, 200);
         });
     }
 });
 
-// Populate log table
-function populateLogs(logs) {
-    const tableBody = document.getElementById('log-table-body');
-    tableBody.innerHTML = '';
+// Build the query string for the current filters plus any extra parameters
+function buildLogsQuery(extraParams) {
+    const params = new URLSearchParams(extraParams);
+    Object.entries(currentLogFilters).forEach(([key, value]) => {
+        if (value) {
+            params.set(key, value);
+        }
+    });
+    return params.toString();
+}
 
-    logs.forEach(log => {
-        const row = document.createElement('tr');
-
-        const timestampCell = document.createElement('td');
-        timestampCell.textContent = formatDate(log.timestamp);
-
-        const userCell = document.createElement('td');
-        userCell.textContent = log.user;
-
-        const locationCell = document.createElement('td');
-        locationCell.textContent = log.location;
-
-        const statusCell = document.createElement('td');
-        statusCell.innerHTML = log.status === 'success' 
-            ? '<span class="success"><i class="fas fa-check-circle"></i> Success</span>' 
-            : '<span class="failure"><i class="fas fa-times-circle"></i> Failed</span>';
-
-        const detailsCell = document.createElement('td');
-        detailsCell.textContent = log.details;
-
-        const deleteCell = document.createElement('td');
-        const deleteButton = document.createElement('button');
-        deleteButton.textContent = 'Delete';
-        deleteButton.className = 'btn delete-btn';
-        deleteButton.setAttribute('aria-label', 'Delete log entry');
-        deleteButton.addEventListener('click', () => {
-            if (confirm('Are you sure you want to delete this log?')) {
-                // Send a DELETE request to the server to remove the log
-                fetch(`/api/logs/${log.id}`, { method: 'DELETE' })
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.status === 'success') {
-                            // Show feedback on mobile
-                            if (window.innerWidth <= 768) {
-                                showNotification('Log entry deleted successfully', 'success');
-                            }
-                            
-                            // Fetch logs again to update the table
-                            fetch('/api/logs')
-                                .then(response => response.json())
-                                .then(updatedLogs => {
-                                    const sortedLogs = updatedLogs.sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp));
-                                    populateLogs(sortedLogs);
-                                })
-                                .catch(error => {
-                                    console.error('Error fetching logs:', error);
-                                });
-                        } else {
-                            showNotification(`Error: ${data.message}`, 'error');
-                        }
-                    })
-                    .catch(error => {
-                        console.error('Error deleting log:', error);
-                        showNotification('An error occurred while deleting the log.', 'error');
-                    });
+// Fetch a page of logs matching the current filters. Without a cursor the
+// table is replaced with the newest page; with one the page is appended.
+function loadLogs(before) {
+    const extraParams = { limit: LOGS_PAGE_SIZE };
+    if (before) {
+        extraParams.before = before;
+    }
+
+    fetch(`/api/logs?${buildLogsQuery(extraParams)}`)
+        .then(response => response.json())
+        .then(data => {
+            nextLogsCursor = data.next_before;
+            if (!before) {
+                logsSyncCursor = data.cursor;
+            }
+            populateLogs(data.logs, Boolean(before));
+            document.getElementById('load-more-button').style.display = nextLogsCursor ? 'block' : 'none';
+        })
+        .catch(error => {
+            console.error('Error fetching logs:', error);
+        });
+}
+
+// Apply only the entries added and deleted since the last sync. A burst of
+// events while a sync is in flight is folded into one follow-up request.
+function syncLogs() {
+    if (logsSyncCursor === null) {
+        return;
+    }
+    if (logsSyncInFlight) {
+        logsSyncPending = true;
+        return;
+    }
+    logsSyncInFlight = true;
+
+    fetch(`/api/logs?${buildLogsQuery({ since: logsSyncCursor })}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.reset) {
+                // Too far behind the server's change feed; start over
+                loadLogs();
+                return;
+            }
+            logsSyncCursor = data.cursor;
+            data.deleted.forEach(removeLogRow);
+            // New entries arrive newest first; prepend oldest first to keep that order
+            data.logs.slice().reverse().forEach(log => {
+                if (!findLogRow(log.id)) {
+                    insertLogRow(log);
+                }
+            });
+        })
+        .catch(error => {
+            console.error('Error syncing logs:', error);
+        })
+        .finally(() => {
+            logsSyncInFlight = false;
+            if (logsSyncPending) {
+                logsSyncPending = false;
+                syncLogs();
             }
         });
-        deleteCell.appendChild(deleteButton);
+}
+
+function findLogRow(logId) {
+    return document.querySelector(`#log-table-body tr[data-log-id="${CSS.escape(logId)}"]`);
+}
+
+function removeLogRow(logId) {
+    const row = findLogRow(logId);
+    if (row) {
+        row.remove();
+        updateDeleteSelectedButton();
+    }
+}
+
+// Enable the bulk delete button only while rows are selected
+function updateDeleteSelectedButton() {
+    const selectedCount = document.querySelectorAll('#log-table-body .log-select:checked').length;
+    const button = document.getElementById('delete-selected-button');
+    button.disabled = selectedCount === 0;
+    button.textContent = selectedCount > 0 ? `Delete Selected (${selectedCount})` : 'Delete Selected';
+}
 
-        row.appendChild(timestampCell);
-        row.appendChild(userCell);
-        row.appendChild(locationCell);
-        row.appendChild(statusCell);
-        row.appendChild(detailsCell);
-        row.appendChild(deleteCell);
+// Add a new entry at the top of the table
+function insertLogRow(log) {
+    const tableBody = document.getElementById('log-table-body');
+    const emptyRow = tableBody.querySelector('tr.empty-row');
+    if (emptyRow) {
+        emptyRow.remove();
+    }
+    tableBody.insertBefore(createLogRow(log), tableBody.firstChild);
+}
 
-        tableBody.appendChild(row);
+// Populate log table, optionally appending to the rows already shown
+function populateLogs(logs, append) {
+    const tableBody = document.getElementById('log-table-body');
+    if (!append) {
+        tableBody.innerHTML = '';
+        document.getElementById('select-all-logs').checked = false;
+        updateDeleteSelectedButton();
+    }
+
+    logs.forEach(log => {
+        tableBody.appendChild(createLogRow(log));
     });
     
     // If no logs found
-    if (logs.length === 0) {
+    if (logs.length === 0 && !append) {
         const emptyRow = document.createElement('tr');
+        emptyRow.className = 'empty-row';
         const emptyCell = document.createElement('td');
-        emptyCell.colSpan = 6;
+        emptyCell.colSpan = 7;
         emptyCell.textContent = 'No logs found matching your criteria';
         emptyCell.style.textAlign = 'center';
         emptyCell.style.padding = '20px';
@@ -189,6 +246,78 @@ function populateLogs(logs) {
     }
 }
 
+// Build the table row for a single log entry
+function createLogRow(log) {
+    const row = document.createElement('tr');
+    row.dataset.logId = log.id;
+
+    const selectCell = document.createElement('td');
+    const selectCheckbox = document.createElement('input');
+    selectCheckbox.type = 'checkbox';
+    selectCheckbox.className = 'log-select';
+    selectCheckbox.setAttribute('aria-label', 'Select log entry');
+    selectCheckbox.addEventListener('change', updateDeleteSelectedButton);
+    selectCell.appendChild(selectCheckbox);
+
+    const timestampCell = document.createElement('td');
+    timestampCell.textContent = formatDate(log.timestamp);
+
+    const userCell = document.createElement('td');
+    userCell.textContent = log.user;
+
+    const locationCell = document.createElement('td');
+    locationCell.textContent = log.location;
+
+    const statusCell = document.createElement('td');
+    statusCell.innerHTML = log.status === 'success' 
+        ? '<span class="success"><i class="fas fa-check-circle"></i> Success</span>' 
+        : '<span class="failure"><i class="fas fa-times-circle"></i> Failed</span>';
+
+    const detailsCell = document.createElement('td');
+    detailsCell.textContent = log.details;
+
+    const deleteCell = document.createElement('td');
+    const deleteButton = document.createElement('button');
+    deleteButton.textContent = 'Delete';
+    deleteButton.className = 'btn delete-btn';
+    deleteButton.setAttribute('aria-label', 'Delete log entry');
+    deleteButton.addEventListener('click', () => {
+        if (confirm('Are you sure you want to delete this log?')) {
+            // Send a DELETE request to the server to remove the log
+            fetch(`/api/logs/${log.id}`, { method: 'DELETE' })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.status === 'success') {
+                        // Show feedback on mobile
+                        if (window.innerWidth <= 768) {
+                            showNotification('Log entry deleted successfully', 'success');
+                        }
+                        
+                        // Remove the row in place; other pages catch up via logs_changed
+                        removeLogRow(log.id);
+                    } else {
+                        showNotification(`Error: ${data.message}`, 'error');
+                    }
+                })
+                .catch(error => {
+                    console.error('Error deleting log:', error);
+                    showNotification('An error occurred while deleting the log.', 'error');
+                });
+        }
+    });
+    deleteCell.appendChild(deleteButton);
+
+    row.appendChild(selectCell);
+    row.appendChild(timestampCell);
+    row.appendChild(userCell);
+    row.appendChild(locationCell);
+    row.appendChild(statusCell);
+    row.appendChild(detailsCell);
+    row.appendChild(deleteCell);
+
+    return row;
+}
+
 // Display notification for mobile feedback
 function showNotification(message, type) {
     // Remove any existing notifications
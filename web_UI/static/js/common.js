@@ -77,15 +77,15 @@ function updateStatusIndicators(data) {
         }
     }
     
-    // Update auth counts if available on the current page
+    // Update today's auth counts if available on the current page
     const successCount = document.getElementById('successful-auth-count');
-    if (successCount && data.auth_success_count !== undefined) {
-        successCount.textContent = data.auth_success_count;
+    if (successCount && data.auth_success_today !== undefined) {
+        successCount.textContent = data.auth_success_today;
     }
     
     const failCount = document.getElementById('failed-auth-count');
-    if (failCount && data.auth_failure_count !== undefined) {
-        failCount.textContent = data.auth_failure_count;
+    if (failCount && data.auth_failure_today !== undefined) {
+        failCount.textContent = data.auth_failure_today;
     }
 }
 
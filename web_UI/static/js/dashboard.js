@@ -1,42 +1,20 @@
 // Dashboard specific JavaScript
 
 document.addEventListener('DOMContentLoaded', function() {
-    const successCountElement = document.getElementById('successful-auth-count');
-    const failCountElement = document.getElementById('failed-auth-count');
     const currentDateElement = document.getElementById('current-date');
 
     // Display the current date in the header
     const currentDate = new Date().toLocaleDateString();
     currentDateElement.textContent = currentDate;
 
-    // Fetch logs for the current day and update counters
-    fetch('/api/logs')
+    // Today's counts and the activity charts come from the server-side rollups
+    loadStats();
+
+    // Populate the live events list with the 10 most recent events
+    fetch('/api/logs?limit=10')
         .then(response => response.json())
         .then(data => {
-            const today = new Date().toISOString().split('T')[0]; // Get today's date in YYYY-MM-DD format
-            let successCount = 0;
-            let failCount = 0;
-
-            // Filter logs for the current day
-            data.forEach(log => {
-                const logDate = new Date(log.timestamp).toISOString().split('T')[0];
-                if (logDate === today) {
-                    if (log.status === 'success') {
-                        successCount++;
-                    } else if (log.status === 'failure') {
-                        failCount++;
-                    }
-                }
-            });
-
-            // Update the dashboard counters
-            successCountElement.textContent = successCount;
-            failCountElement.textContent = failCount;
-            
-            // Populate the live events list with the 10 most recent events
-            const recentEvents = [...data]
-                .sort((a, b) => new Date(b.timestamp) - new Date(a.timestamp))
-                .slice(0, 10);
+            const recentEvents = data.logs;
                 
             // Clear any existing events
             const eventsContainer = document.getElementById('live-events');
@@ -85,26 +63,20 @@ document.addEventListener('DOMContentLoaded', function() {
         const DUPLICATE_THRESHOLD_MS = 2000; // 2 seconds
         
         socket.on('auth_event', function(data) {
-            const eventDate = new Date(data.timestamp).toISOString().split('T')[0];
-            const today = new Date().toISOString().split('T')[0];
             const currentTime = new Date().getTime();
             
             // Update tracking variables
             lastEventTime = currentTime;
             lastEventStatus = data.status;
 
-            // Update counters only if the event is for the current day
-            if (eventDate === today) {
-                if (data.status === 'success') {
-                    successCountElement.textContent = parseInt(successCountElement.textContent) + 1;
-                } else if (data.status === 'failure') {
-                    failCountElement.textContent = parseInt(failCountElement.textContent) + 1;
-                }
-            }
-
             // Add event to the live events list
             addEventToList(data);
         });
+
+        // Any committed add or delete changes the rollups
+        socket.on('logs_changed', function(data) {
+            loadStats();
+        });
     }
 
     // Auth method selector functionality
@@ -317,6 +289,97 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Fetch the rollups from the server and refresh the counters and charts.
+// Requests made while one is in flight are folded into a single follow-up.
+let statsInFlight = false;
+let statsPending = false;
+
+function loadStats() {
+    if (statsInFlight) {
+        statsPending = true;
+        return;
+    }
+    statsInFlight = true;
+
+    fetch('/api/stats?days=7')
+        .then(response => response.json())
+        .then(stats => {
+            document.getElementById('successful-auth-count').textContent = stats.today.success || 0;
+            document.getElementById('failed-auth-count').textContent = stats.today.failure || 0;
+
+            renderBarChart('daily-chart', stats.by_day.map(bucket => ({
+                label: new Date(`${bucket.day}T00:00:00`).toLocaleDateString('en-US', { weekday: 'short' }),
+                title: bucket.day,
+                success: bucket.success,
+                failure: bucket.failure
+            })));
+            renderBarChart('hourly-chart', stats.by_hour.map(bucket => ({
+                label: bucket.hour % 6 === 0 ? String(bucket.hour) : '',
+                title: `${bucket.hour}:00`,
+                success: bucket.success,
+                failure: bucket.failure
+            })));
+            renderBarChart('method-chart', stats.by_method.map(bucket => ({
+                label: bucket.method,
+                title: bucket.method,
+                success: bucket.success,
+                failure: bucket.failure
+            })));
+        })
+        .catch(error => {
+            console.error('Error fetching stats:', error);
+        })
+        .finally(() => {
+            statsInFlight = false;
+            if (statsPending) {
+                statsPending = false;
+                loadStats();
+            }
+        });
+}
+
+// Draw stacked success/failure bars, scaled to the largest bucket
+function renderBarChart(elementId, buckets) {
+    const chart = document.getElementById(elementId);
+    chart.innerHTML = '';
+
+    if (buckets.length === 0) {
+        chart.textContent = 'No data yet';
+        return;
+    }
+
+    const largest = Math.max(1, ...buckets.map(bucket => bucket.success + bucket.failure));
+    buckets.forEach(bucket => {
+        const item = document.createElement('div');
+        item.className = 'bar-item';
+        item.title = `${bucket.title}: ${bucket.success} successful, ${bucket.failure} failed`;
+
+        const bar = document.createElement('div');
+        bar.className = 'bar';
+        ['success', 'failure'].forEach(status => {
+            const segment = document.createElement('div');
+            segment.className = `bar-segment ${status}`;
+            segment.style.flexGrow = bucket[status];
+            bar.appendChild(segment);
+        });
+        // The bar's own size carries the total; the segments split it
+        const size = `${(bucket.success + bucket.failure) / largest * 100}%`;
+        if (chart.classList.contains('rows')) {
+            bar.style.width = size;
+        } else {
+            bar.style.height = size;
+        }
+
+        const label = document.createElement('span');
+        label.className = 'bar-label';
+        label.textContent = bucket.label;
+
+        item.appendChild(bar);
+        item.appendChild(label);
+        chart.appendChild(item);
+    });
+}
+
 // Modified function to add events to the live events list
 function addEventToList(event) {
     const eventsContainer = document.getElementById('live-events');
@@ -630,13 +693,6 @@ function initRotaryLock() {
                     location: 'Main Entrance',
                     details: `Correct color sequence entered: ${selectedColors.join(', ')}`
                 });
-                
-                // Increment authentication counter
-                const successCountElement = document.getElementById('successful-auth-count');
-                if(successCountElement) {
-                    const currentCount = parseInt(successCountElement.textContent);
-                    successCountElement.textContent = currentCount + 1;
-                }
             }
             
             // Animate success
@@ -660,13 +716,6 @@ function initRotaryLock() {
                     location: 'Main Entrance',
                     details: `Incorrect color sequence: ${selectedColors.join(', ')}`
                 });
-                
-                // Increment failure counter
-                const failCountElement = document.getElementById('failed-auth-count');
-                if(failCountElement) {
-                    const currentCount = parseInt(failCountElement.textContent);
-                    failCountElement.textContent = currentCount + 1;
-                }
             }
             
             // Animate failure
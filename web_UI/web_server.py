@@ -15,15 +15,25 @@ import os
 import sys
 import time
 import json
+import atexit
+import signal
 import threading
 import logging
-import subprocess
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Response, render_template, jsonify, request, send_file, stream_with_context
 from flask_socketio import SocketIO, emit
 import uuid
 import socket
+import csv
+import io
+import zlib
 from dotenv import load_dotenv 
+from log_store import AuthLogStore, DEFAULT_PAGE_SIZE, ENTRY_COLUMNS
+import http_cache
+from settings_cache import SettingsCache
+from pico_link import PicoLink, PicoLinkError, PICO_USB_VID, PICO_USB_PID
+from device_watcher import DeviceWatcher
+from mpy_compile import module_files
 
 # Load environment variables from .env file in the root directory
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
@@ -45,6 +55,7 @@ logger = logging.getLogger("MFALock")
 # Flask app setup
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'mfalock-secret-key!'
+http_cache.init_app(app)  # ETags, 304s, compression and static fingerprints
 socketio = SocketIO(app)
 
 LISTENER_PI_IP = os.getenv("LISTENER_PI_IP")
@@ -59,33 +70,64 @@ LISTENER_PI_PORT = int(os.getenv("LISTENER_PI_PORT", 8080))
 
 # Global variables
 pico_connected = False
-pico_process = None
+pico_link = None  # Serial link to the Pico while it is connected
+pico_sensors_running = threading.Event()  # Set while all_sensors runs and is being monitored
+PICO_RELOAD_TIMEOUT = 2  # seconds to wait for the Pico to confirm a settings reload
+PICO_RESTART_TIMEOUT = 40  # seconds to wait for the Pico to come back after a reset
+# Rotary angles are sent to the clients at most this often; the latest angle wins
+ROTARY_UPDATE_HZ = float(os.getenv("ROTARY_UPDATE_HZ", 30))
+pending_rotary_angle = None  # Newest angle not yet sent to the clients
+last_rotary_update = 0.0  # time.monotonic() of the last rotary_update
+pico_event_stats = {'events': 0, 'angles': 0, 'rotary_updates': 0, 'rotary_coalesced': 0}
 current_sensor_mode = "idle"  
 LOG_FILE_PATH = "auth_logs.json" 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_JOURNAL_PATH = os.path.join(BASE_DIR, "auth_logs.ndjson")
+LOG_DB_PATH = os.path.join(BASE_DIR, "auth_logs.db")
+LOG_ARCHIVE_DIR = os.path.join(BASE_DIR, "log_archive")
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", 30))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 0.2))  # seconds
+LOG_FSYNC_POLICY = os.getenv("LOG_FSYNC_POLICY", "full")  # full, normal or off
 SETTINGS_FILE_PATH = os.path.join(BASE_DIR, "settings.json")
 
+def normalize_auth_event(data):
+    """Make a browser-sent auth event safe to store: the logged fields become strings.
+
+    Returns None if the event is not a JSON object.
+    """
+    if not isinstance(data, dict):
+        return None
+    # The server's clock, unless the browser sent an ISO timestamp
+    timestamp = data.get('timestamp')
+    try:
+        datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        if timestamp is not None:
+            logger.warning(f"Replacing invalid auth event timestamp {timestamp!r}")
+        data['timestamp'] = datetime.now().isoformat()
+    if not isinstance(data.get('id'), str) or not data['id']:
+        data['id'] = str(uuid.uuid4())
+    for key in ENTRY_COLUMNS:
+        value = data.get(key)
+        if value is not None and not isinstance(value, str):
+            data[key] = json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    return data
+
 # Add WebSocket route to handle manual auth events from the browser
 @socketio.on('auth_event')
 def handle_auth_event(data):
     """Handle authentication events sent from the browser"""
-    global auth_log_entries
-    
-    # Ensure the data has a timestamp
-    if 'timestamp' not in data:
-        data['timestamp'] = datetime.now().isoformat()
-    
-    # Ensure the data has an ID
-    if 'id' not in data:
-        data['id'] = str(uuid.uuid4())
+    data = normalize_auth_event(data)
+    if data is None:
+        logger.error("Ignoring auth event that is not a JSON object")
+        return
     
     # Add the event to our logs
-    auth_log_entries.append(data)
-    save_logs(auth_log_entries)
+    log_store.append(data)
     
     # Broadcast the event to all clients
     socketio.emit('auth_event', data)
-    logger.info(f"Auth event received from client: {data['status']} - {data['message']}")
+    logger.info(f"Auth event received from client: {data.get('status')} - {data.get('message')}")
 
     # Check if it's a successful rotary authentication and send to listener
     if data.get('method') == 'Rotary Lock' and data.get('status') == 'success':
@@ -146,151 +188,296 @@ def handle_lcd_mode_update(data):
     # This event will be picked up by dashboard.js to update the UI
     socketio.emit('sensor_mode_change', {'mode': mode})
 
-def load_logs():
-    """Load logs from the log file."""
-    if os.path.exists(LOG_FILE_PATH):
-        try:
-            with open(LOG_FILE_PATH, 'r') as file:
-                return json.load(file)
-        except json.JSONDecodeError:
-            logger.error(f"Error decoding JSON from {LOG_FILE_PATH}")
-            return []
-        except Exception as e:
-            logger.error(f"Error loading logs: {e}")
-            return []
-    return []
-
-def save_logs(logs):
-    """Save logs to the log file."""
-    try:
-        with open(LOG_FILE_PATH, 'w') as file:
-            json.dump(logs, file, indent=4)
-    except Exception as e:
-        logger.error(f"Error saving logs: {e}")
+# Default settings if the file doesn't exist
+DEFAULT_SETTINGS = {
+    'customPattern': [{"action": "tap", "duration": 0}, {"action": "hold", "duration": 1000}, {"action": "tap", "duration": 0}],
+    'colorSequence': ['red', 'blue', 'green', 'yellow']
+}
+settings_cache = SettingsCache(SETTINGS_FILE_PATH, defaults=DEFAULT_SETTINGS)
+# Settings the Pico reads; changing any of them needs the device updated
+PICO_SETTINGS_KEYS = {'customPattern', 'colorSequence'}
+# Name of the settings file on the Pico's filesystem (read by all_sensors.py)
+PICO_SETTINGS_FILE = "settings.json"
 
 def load_settings():
-    """Load settings from the settings file."""
-    if os.path.exists(SETTINGS_FILE_PATH):
-        try:
-            with open(SETTINGS_FILE_PATH, 'r') as file:
-                return json.load(file)
-        except json.JSONDecodeError:
-            logger.error(f"Error decoding JSON from {SETTINGS_FILE_PATH}")
-        except Exception as e:
-            logger.error(f"Error loading settings: {e}")
-
-    # Default settings if file doesn't exist or is invalid
+    """Return the current settings; the file is only re-read when it changes."""
+    return settings_cache.get()
+
+def save_settings(changes):
+    """Merge changes into the settings file atomically.
+
+    Returns:
+        set: the keys whose values actually changed
+    """
+    return settings_cache.update(changes)
+
+def broadcast_logs_changed(cursor):
+    """Tell open logs pages that the log changed so they can delta-sync."""
+    socketio.emit('logs_changed', {'cursor': cursor})
+
+log_store = AuthLogStore(
+    LOG_DB_PATH,
+    journal_path=LOG_JOURNAL_PATH,
+    legacy_path=LOG_FILE_PATH,
+    archive_dir=LOG_ARCHIVE_DIR,
+    retention_days=LOG_RETENTION_DAYS,
+    fsync_policy=LOG_FSYNC_POLICY,
+    on_commit=broadcast_logs_changed
+).open()
+
+def get_status_payload():
+    """Build the status_update payload from the log store's running counters."""
+    totals = log_store.status_counts()
+    today = log_store.daily_counts(datetime.now().date().isoformat())
     return {
-        'customPattern': [{"action": "tap", "duration": 0}, {"action": "hold", "duration": 1000}, {"action": "tap", "duration": 0}],
-        'colorSequence': ['red', 'blue', 'green', 'yellow']
+        'pico_connected': pico_connected,
+        'auth_success_count': totals.get('success', 0),
+        'auth_failure_count': totals.get('failure', 0),
+        'auth_success_today': today.get('success', 0),
+        'auth_failure_today': today.get('failure', 0)
     }
 
-def save_settings(settings):
-    """Save settings to the settings file."""
-    try:
-        with open(SETTINGS_FILE_PATH, 'w') as file:
-            json.dump(settings, file, indent=4)
-        logger.info(f"Settings saved to {SETTINGS_FILE_PATH}")
-    except Exception as e:
-        logger.error(f"Error saving settings: {e}")
-
-auth_log_entries = load_logs()
-settings = load_settings()
+def setup_pico_connection(port):
+    """Establish the serial link to the Pico device at ``port``"""
+    global pico_connected, pico_link
 
-def setup_pico_connection():
-    """Establish connection to the Pico device using mpremote"""
-    global pico_connected
-    pico_id = "2e8a:0005"  # Pico USB device ID
-    
     # Check if Pico is available
-    result = subprocess.run(
-        ["mpremote", "connect", "list"], 
-        capture_output=True, 
-        text=True
-    )
-
-    if pico_id not in result.stdout:
+    if port is None:
         logger.error("Could not find Pico device. Please check connection.")
         pico_connected = False
         return False
     
-    logger.info("Pico device detected")
+    logger.info(f"Pico device detected on {port}")
+    try:
+        link = PicoLink(port)
+        # Soft reset so a sensor program left over from an earlier session stops
+        link.open(soft_reset=True)
+    except PicoLinkError as e:
+        logger.error(f"Could not open serial link to Pico: {e}")
+        pico_connected = False
+        return False
+
+    pico_link = link
     pico_connected = True
     return True
   
 
-def check_and_copy_all_sensors():
-    """Check if all_sensors.py exists on the Pico, and copy it if not present"""
-    global pico_connected
-    
+def close_pico_link():
+    """Return the Pico to its normal REPL when the server exits"""
+    if pico_link is not None:
+        pico_link.close()
+
+def deploy_pico_files():
+    """Copy all_sensors (as .mpy bytecode when possible) and settings.json to the Pico if they changed"""
     if not pico_connected:
-        logger.error("Pico is not connected. Cannot check for all_sensors.py.")
+        logger.error("Pico is not connected. Cannot copy all_sensors.py.")
         return False
     
+    # Get the path to all_sensors.py
+    all_sensors_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
+        "pico_sensors",
+        "all_sensors.py"
+    )
+    if not os.path.exists(all_sensors_path):
+        logger.error(f"Cannot find source file at {all_sensors_path}")
+        return False
+
     try:
-        # Always copy the latest version of all_sensors.py to the Pico
-        logger.info("Copying all_sensors.py to Pico...")
-        
-        # Get the path to all_sensors.py
-        all_sensors_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
-            "pico_sensors",
-            "all_sensors.py"
-        )
-        
-        if not os.path.exists(all_sensors_path):
-            logger.error(f"Cannot find source file at {all_sensors_path}")
-            return False
-        
-        # Delete the existing all_sensors.py file on the Pico if it exists
-        delete_result = subprocess.run(
-            ["mpremote", "rm", ":all_sensors.py"],
-            capture_output=True,
-            text=True
-        )
-        
-        if delete_result.returncode != 0 and "No such file or directory" not in delete_result.stderr:
-            logger.error(f"Failed to delete existing all_sensors.py: {delete_result.stderr}")
-            return False
-        
-        # Copy the file to the Pico
-        copy_result = subprocess.run(
-            ["mpremote", "cp", all_sensors_path, ":all_sensors.py"],
-            capture_output=True,
-            text=True
-        )
-        
-        if copy_result.returncode != 0:
-            logger.error(f"Failed to copy all_sensors.py: {copy_result.stderr}")
-            return False
-        
-        logger.info("Successfully copied all_sensors.py to Pico")
+        # Precompiled bytecode saves the Pico compiling the source at every start
+        files, stale_file = module_files(all_sensors_path, "all_sensors", pico_link.mpy_version())
+        # all_sensors reads settings.json at startup
+        if os.path.exists(SETTINGS_FILE_PATH):
+            files[PICO_SETTINGS_FILE] = SETTINGS_FILE_PATH
+        else:
+            logger.warning(f"Settings file not found at {SETTINGS_FILE_PATH}. Pico might use defaults.")
+
+        # Only files whose content differs from the Pico's copy are sent
+        copied = pico_link.deploy(files)
+        pico_link.remove(stale_file)
+        logger.info(f"Pico files up to date ({len(copied)} of {len(files)} copied)")
         return True
-    except Exception as e:
-        logger.error(f"Error checking or copying all_sensors.py: {e}")
+    except (PicoLinkError, OSError) as e:
+        logger.error(f"Error copying files to Pico: {e}")
         return False
 
+# Starts all_sensors: the sensor loop runs on core 1 and its events are
+# reported from a timer on core 0, leaving the REPL free for commands
+PICO_LAUNCHER_SCRIPT = (
+    'import gc, sys\n'
+    'gc.collect()\n'
+    '# Minimal module cleanup\n'
+    'for name in list(sys.modules):\n'
+    '    if name not in ("gc", "sys", "_thread", "micropython", "uctypes", "array", "rp2"):\n'
+    '        try: del sys.modules[name]\n'
+    '        except KeyError: pass\n'
+    'gc.collect()\n'
+    '# start() runs the sensors on core 1 and returns, leaving the REPL on core 0\n'
+    'print("# Starting all_sensors...")\n'
+    '__import__("all_sensors").start()\n'
+    'print("# all_sensors started.")\n'
+)
+
 def run_all_sensors():
-    """Send command to run the all sensors program on the Pico asynchronously."""
+    """Start the all sensors program on the Pico in the background."""
     if not pico_connected:
         logger.error("Pico is not connected. Cannot run all sensors program.")
         return False
     
     try:
-        # Run the all sensors Python file using mpremote
         logger.info("Starting all sensors program on Pico...")
-        subprocess.run(
-            ["mpremote", "exec", "import all_sensors"], 
-            check=True
-        )
+        pico_link.exec(PICO_LAUNCHER_SCRIPT)
+        logger.info("Successfully started all_sensors.py via launcher script.")
         return True
-    except Exception as e:
-        logger.error(f"Failed to run all sensors program: {e}")
+    except PicoLinkError as e:
+        logger.error(f"Failed to start all_sensors.py: {e}")
         return False
 
+# Auth log method for each Pico sensor
+PICO_SENSOR_METHODS = {'touch': 'Touch Pattern', 'rotary': 'Rotary Input'}
+# Touches shorter than this are shown as taps, longer ones as holds
+TAP_MAX_DURATION = 500  # ms
+
+def set_sensor_mode(mode):
+    """Record the Pico's active sensor and tell the clients"""
+    global current_sensor_mode
+    prev_mode = current_sensor_mode
+    current_sensor_mode = mode
+    logger.info(f"Sensor mode changed from {prev_mode} to {current_sensor_mode}")
+    socketio.emit('sensor_mode_change', {'mode': current_sensor_mode})
+
+def log_pico_auth(event, status, message, details):
+    """Store and broadcast an authentication attempt reported by the Pico"""
+    log_entry = {
+        'id': str(uuid.uuid4()),
+        'timestamp': datetime.now().isoformat(),
+        'user': 'User' if status == 'success' else 'Unknown',
+        'location': 'Main Entrance',
+        'status': status,
+        'message': message,
+        'details': details,
+        'method': PICO_SENSOR_METHODS.get(event.get('s', current_sensor_mode), 'Unknown')
+    }
+    log_store.append(log_entry)
+    socketio.emit('auth_event', log_entry)
+    return log_entry
+
+def on_pico_ready(event):
+    logger.info("Pico sensor program ready")
+
+def on_pico_mode(event):
+    mode = event.get('s', 'idle')
+    if mode == 'idle':
+        # Idle timeout: clear any half-entered pattern on the dashboard
+        socketio.emit('touch_event', {'action': 'reset'})
+    set_sensor_mode(mode)
+
+def on_pico_touch_start(event):
+    socketio.emit('touch_event', {'action': 'hold_start'})
+
+def on_pico_touch_end(event):
+    duration = event.get('d')
+    if duration is None:
+        socketio.emit('touch_event', {'action': 'hold_end'})
+    elif duration < TAP_MAX_DURATION:
+        socketio.emit('touch_event', {'action': 'tap'})
+    else:
+        socketio.emit('touch_event', {'action': 'hold_end', 'duration': duration})
+
+def on_pico_step(event):
+    logger.info(f"Pico: pattern step {event.get('n')} entered ({event.get('d')}ms)")
+
+def on_pico_success(event):
+    socketio.emit('touch_event', {'action': 'success'})
+    log_entry = log_pico_auth(event, 'success',
+                              'Access granted: Touch pattern recognized correctly',
+                              'Touch pattern recognized')
+    send_to_listener("TOUCH - SUCCESS")
+    #for lcd
+    socketio.emit('auth_success', log_entry)
+
+def on_pico_failure(event):
+    step = event.get('n')
+    if event.get('r') == 'timeout':
+        socketio.emit('touch_event', {'action': 'timeout'})
+        details = f'Touch pattern timed out at step {step}'
+    else:
+        socketio.emit('touch_event', {'action': 'failure'})
+        details = f'Incorrect touch pattern at step {step}'
+    log_pico_auth(event, 'failure', 'Access denied: Incorrect touch pattern', details)
+    send_to_listener("FAILURE")
+
+def on_pico_angle(event):
+    global pending_rotary_angle
+    if current_sensor_mode != 'rotary' or 'a' not in event:
+        return
+    # Only remember the angle; flush_rotary_update() sends the newest one
+    pico_event_stats['angles'] += 1
+    if pending_rotary_angle is not None:
+        pico_event_stats['rotary_coalesced'] += 1
+    pending_rotary_angle = event['a']
+
+def flush_rotary_update():
+    """Send the newest rotary angle if one is waiting and the rate limit allows.
+
+    Returns:
+        float or None: seconds until a waiting angle can be sent, or None if
+        nothing is waiting
+    """
+    global pending_rotary_angle, last_rotary_update
+    if pending_rotary_angle is None:
+        return None
+    now = time.monotonic()
+    wait = last_rotary_update + 1 / ROTARY_UPDATE_HZ - now
+    if wait > 0:
+        return wait
+    socketio.emit('rotary_update', {'angle': pending_rotary_angle})
+    pending_rotary_angle = None
+    last_rotary_update = now
+    pico_event_stats['rotary_updates'] += 1
+    return None
+
+def on_pico_settings(event):
+    logger.info(f"Pico applied new settings ({event.get('n')} pattern steps)")
+
+# Pico event type -> handler; see the protocol in pico_sensors/all_sensors.py
+PICO_EVENT_HANDLERS = {
+    'ready': on_pico_ready,
+    'mode': on_pico_mode,
+    'touch_start': on_pico_touch_start,
+    'touch_end': on_pico_touch_end,
+    'step': on_pico_step,
+    'success': on_pico_success,
+    'failure': on_pico_failure,
+    'angle': on_pico_angle,
+    'settings': on_pico_settings,
+}
+
+def handle_pico_line(line):
+    """Decode one line of Pico output and dispatch it"""
+    if line.startswith('{'):
+        try:
+            event = json.loads(line)
+            handler = PICO_EVENT_HANDLERS.get(event.get('e'))
+        except (ValueError, AttributeError):
+            logger.warning(f"Malformed Pico event: {line}")
+            return
+        if handler is None:
+            logger.warning(f"Unknown Pico event: {line}")
+            return
+        logger.debug(f"Pico event: {line}")
+        pico_event_stats['events'] += 1
+        handler(event)
+    elif line.startswith('#'):
+        # Debug channel: for people, not parsed
+        logger.debug(f"Pico: {line[1:].strip()}")
+    else:
+        # REPL output, e.g. the launcher's messages or a traceback
+        logger.info(f"Pico: {line}")
+
 def monitor_pico():
-    """Monitor the Pico's output for events using mpremote"""
-    global auth_log_entries, pico_process, pico_connected
+    """Monitor the Pico's output for events over the serial link"""
+    global pico_connected
     global current_sensor_mode  
     
     if not pico_connected:
@@ -301,250 +488,107 @@ def monitor_pico():
     current_sensor_mode = "idle"  
     
     try:
-        # Start mpremote in repl mode and capture its output
-        pico_process = subprocess.Popen(
-            ["mpremote", "repl", "--escape-non-printable"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        
         # Emit status update to clients
-        socketio.emit('status_update', {
-            'pico_connected': pico_connected,
-            'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-            'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-        })
+        socketio.emit('status_update', get_status_payload())
         
-        # Read output line by line
-        while pico_connected and pico_process.poll() is None:
-            line = pico_process.stdout.readline().strip()
+        # Handle each line as soon as it arrives, until the link drops. Angle
+        # events only record the newest angle, so a burst of them never holds
+        # up the touch events behind it; it is sent when the rate limit allows.
+        while pico_connected and pico_link.connected:
+            wait = flush_rotary_update()
+            line = pico_link.readline(timeout=0.5 if wait is None else wait)
             if line:
-                logger.info(f"Pico: {line}")
-
-                # --- Touch event emission ---
-                if "Touch started" in line:
-                    socketio.emit('touch_event', {'action': 'hold_start'})
-                elif "Touch ended" in line:
-                    # You can parse the duration if you want, e.g. "Touch ended: 1200ms"
-                    try:
-                        duration = int(line.split("Touch ended:")[1].replace("ms", "").strip())
-                        # If it's a quick tap, treat as tap; if longer, treat as hold_end
-                        if duration < 500:
-                            socketio.emit('touch_event', {'action': 'tap'})
-                        else:
-                            socketio.emit('touch_event', {'action': 'hold_end', 'duration': duration})
-                    except Exception:
-                        socketio.emit('touch_event', {'action': 'hold_end'})
-                elif "Step 1: Tap detected" in line or "Step 3: Tap detected" in line:
-                    socketio.emit('touch_event', {'action': 'tap'})
-                elif "Step 2: Hold detected" in line:
-                    socketio.emit('touch_event', {'action': 'hold_end'})
-                elif "TOUCH - SUCCESS" in line:
-                    socketio.emit('touch_event', {'action': 'success'})
-                elif "timeout" in line or "Incorrect input" in line:
-                    socketio.emit('touch_event', {'action': 'failure'})
-                elif "Sensor timeout: returning to idle state" in line:
-                    socketio.emit('touch_event', {'action': 'reset'})
-                # --- End touch event emission ---
-
-                # Detect sensor mode changes
-                if "Touch sensor activated" in line:
-                    prev_mode = current_sensor_mode
-                    current_sensor_mode = "touch"
-                    logger.info(f"Sensor mode changed from {prev_mode} to {current_sensor_mode}")
-                    socketio.emit('sensor_mode_change', {'mode': current_sensor_mode})
-                
-                elif "Rotary sensor activated" in line:
-                    prev_mode = current_sensor_mode
-                    current_sensor_mode = "rotary"
-                    logger.info(f"Sensor mode changed from {prev_mode} to {current_sensor_mode}")
-                    socketio.emit('sensor_mode_change', {'mode': current_sensor_mode})
-                
-                elif "Sensor timeout: returning to idle state" in line:
-                    prev_mode = current_sensor_mode
-                    current_sensor_mode = "idle"
-                    logger.info(f"Sensor mode changed from {prev_mode} to {current_sensor_mode}")
-                    socketio.emit('sensor_mode_change', {'mode': current_sensor_mode})
-                
-                # Process rotary sensor data
-                elif "Angle:" in line and current_sensor_mode == "rotary":
-                    try:
-                        angle = int(line.split("Angle:")[1].split("degrees")[0].strip())
-                        socketio.emit('rotary_update', {'angle': angle})
-                    except Exception as e:
-                        logger.error(f"Error parsing rotary angle: {e}")
-                
-                # Process authentication events
-                elif "TOUCH - SUCCESS" in line:
-                    log_entry = {
-                        'id': str(uuid.uuid4()),
-                        'timestamp': datetime.now().isoformat(),
-                        'user': 'User',
-                        'location': 'Main Entrance',
-                        'status': 'success',
-                        'message': 'Access granted: Touch pattern recognized correctly',
-                        'details': f'Touch pattern recognized',
-                        'method': 'Touch Pattern' if current_sensor_mode == 'touch' else 'Rotary Input' if current_sensor_mode == 'rotary' else 'Unknown'
-                    }
-                    auth_log_entries.append(log_entry)
-                    save_logs(auth_log_entries)
-                    socketio.emit('auth_event', log_entry)
-                    send_to_listener("TOUCH - SUCCESS") 
-                    #for lcd
-                    socketio.emit('auth_success', log_entry)
-                
-                # Detect failed attempts
-                elif "timeout" in line or "Incorrect input" in line:
-                    log_entry = {
-                        'id': str(uuid.uuid4()),
-                        'timestamp': datetime.now().isoformat(),
-                        'user': 'Unknown',
-                        'location': 'Main Entrance',
-                        'status': 'failure',
-                        'message': 'Access denied: Incorrect touch pattern',
-                        'details': f'Incorrect touch pattern: {line}',
-                        'method': 'Touch Pattern' if current_sensor_mode == 'touch' else 'Rotary Input' if current_sensor_mode == 'rotary' else 'Unknown'
-                    }
-                    auth_log_entries.append(log_entry)
-                    save_logs(auth_log_entries)
-                    socketio.emit('auth_event', log_entry) 
-                    send_to_listener("FAILURE") 
-            
-            time.sleep(0.1)
+                try:
+                    handle_pico_line(line)
+                except Exception as e:
+                    logger.error(f"Error handling Pico output '{line}': {e}")
     except Exception as e:
         logger.error(f"Error in Pico monitoring: {e}")
+    finally:
         pico_connected = False
-        
+        pico_link.close()
+
         # Emit disconnection status to clients
-        socketio.emit('status_update', {
-            'pico_connected': pico_connected,
-            'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-            'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-        })
-    finally:
-        if pico_process and pico_process.poll() is None:
-            pico_process.terminate()
-            pico_process = None
+        socketio.emit('status_update', get_status_payload())
+
+def reload_pico_settings(settings):
+    """Apply new settings to the running sensor program without restarting it.
+
+    Sends the Pico's settings inline to all_sensors.reload_settings(), which
+    swaps in the new touch pattern and reports whether it succeeded.
+
+    Returns:
+        bool: True if the Pico confirmed the reload
+    """
+    if not pico_connected:
+        logger.error("Pico is not connected. Cannot reload settings.")
+        return False
+
+    pico_settings = {key: settings[key] for key in PICO_SETTINGS_KEYS if key in settings}
+    expression = f"__import__('all_sensors').reload_settings({json.dumps(json.dumps(pico_settings))})"
+    try:
+        if not pico_link.eval(expression, timeout=PICO_RELOAD_TIMEOUT):
+            logger.error("Pico rejected the new settings")
+            return False
+    except PicoLinkError as e:
+        logger.error(f"Error reloading settings on Pico: {e}")
+        return False
+    logger.info("Pico reloaded settings without restarting")
+    return True
+
+def on_pico_attached(port):
+    """Device watcher callback: the connection thread takes it from here"""
+    logger.info(f"Pico attached at {port}")
+
+def on_pico_detached(port):
+    """Device watcher callback: drop the link at once rather than waiting for a read error"""
+    logger.warning(f"Pico at {port} was unplugged")
+    link = pico_link
+    if link is not None and link.port == port:
+        link.close()
+
+# Reports the Pico being plugged in and unplugged; started in __main__
+pico_watcher = DeviceWatcher(PICO_USB_VID, PICO_USB_PID,
+                             on_connect=on_pico_attached, on_disconnect=on_pico_detached)
 
 def pico_connection_thread():
     """Thread to handle Pico connection and monitoring"""
     global pico_connected
-    reconnection_interval = 1  # seconds between reconnection attempts
+    reconnection_interval = 1  # seconds before retrying a Pico that failed to set up
     
     while True:
         # Check connection status - whether initially connected or reconnected
         was_connected = pico_connected
         
-        # Check if Pico is connected
-        current_connected = setup_pico_connection()
+        # Wait for the device watcher to see a Pico, then open the serial link to it
+        current_connected = setup_pico_connection(pico_watcher.wait_for_device())
         
         # If connection status changed, notify clients
         if current_connected != was_connected:
             pico_connected = current_connected
             logger.info(f"Pico connection status changed: {'Connected' if pico_connected else 'Disconnected'}")
-            socketio.emit('status_update', {
-                'pico_connected': pico_connected,
-                'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-                'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-            })
+            socketio.emit('status_update', get_status_payload())
         
         # If connected, set up and monitor the Pico
         if pico_connected:
             logger.info("Pico connected. Setting up all sensors...")
-            if check_and_copy_all_sensors():
+            # No need to pass the pattern; all_sensors.py reads settings.json on the Pico
+            if deploy_pico_files() and run_all_sensors():
+                logger.info("Starting to monitor Pico output...")
+                pico_sensors_running.set()
                 try:
-                    # Copy the settings file to the Pico during initial setup
-                    settings_host_path = os.path.join(BASE_DIR, SETTINGS_FILE_PATH)
-                    if os.path.exists(settings_host_path):
-                        logger.info(f"Copying initial {SETTINGS_FILE_PATH} to Pico...")
-                        copy_result = subprocess.run(
-                            ["mpremote", "cp", settings_host_path, f":{SETTINGS_FILE_PATH}"],
-                            capture_output=True,
-                            text=True,
-                            timeout=10
-                        )
-                        if copy_result.returncode == 0:
-                            logger.info(f"Successfully copied {SETTINGS_FILE_PATH} to Pico.")
-                        else:
-                            logger.error(f"Failed to copy {SETTINGS_FILE_PATH}: {copy_result.stderr}")
-                    else:
-                        logger.warning(f"Initial {SETTINGS_FILE_PATH} not found at {settings_host_path}. Pico might use defaults.")
-
-                    # Create a launcher script that runs all_sensors in the background
-                    # No need to pass pattern here, it reads from settings.json on Pico
-                    launcher_script = (
-                        f'import _thread, gc, sys\n'
-                        f'gc.collect()\n'
-                        f'# Minimal module cleanup\n'
-                        f'for name in list(sys.modules):\n'
-                        f'    if name not in ("gc", "sys", "_thread", "micropython", "uctypes", "array", "rp2"):\n'
-                        f'        try: del sys.modules[name]\n'
-                        f'        except KeyError: pass\n'
-                        f'gc.collect()\n'
-                        f'def run_all_sensors():\n'
-                        f'    try:\n'
-                        f'        print("Importing all_sensors...")\n'
-                        f'        all_sensors = __import__("all_sensors")\n'
-                        f'        print("Running all_sensors.main()...")\n'
-                        f'        all_sensors.main()\n'
-                        f'        print("all_sensors.main() finished.")\n'
-                        f'    except Exception as e:\n'
-                        f'        print(f"Error in run_all_sensors: {{e}}")\n'
-                        f'try:\n'
-                        f'    print("Starting thread for run_all_sensors...")\n'
-                        f'    _thread.start_new_thread(run_all_sensors, (()))\n'
-                        f'    print("Thread started.")\n'
-                        f'except Exception as e:\n'
-                        f'    print(f"Error starting thread: {{e}}")\n'
-                    )
-
-                    logger.info("Creating background job to run all_sensors")
-                    # Execute the launcher script
-                    exec_result = subprocess.run(
-                        ["mpremote", "exec", launcher_script],
-                        capture_output=True, text=True, timeout=5
-                    )
-                    logger.info(f"Launcher script stdout: {exec_result.stdout}")
-                    if exec_result.stderr:
-                         logger.error(f"Launcher script stderr: {exec_result.stderr}")
-
-                    if "Thread started." in exec_result.stdout and not exec_result.stderr:
-                         logger.info("Successfully started all_sensors.py via launcher script.")
-                         logger.info("Starting to monitor Pico output...")
-                         monitor_pico() # Start monitoring
-                    else:
-                         logger.error("Failed to start all_sensors.py cleanly via launcher.")
-                         # Handle failure, maybe set pico_connected to False
-                         pico_connected = False
-                         socketio.emit('status_update', {'pico_connected': False})
-
-                except subprocess.TimeoutExpired:
-                    logger.error("Timeout occurred during initial Pico setup (copying files or starting script).")
-                    pico_connected = False
-                    socketio.emit('status_update', {'pico_connected': False})
-                except Exception as e:
-                    logger.error(f"Failed during initial Pico setup: {e}")
-                    pico_connected = False
-                    socketio.emit('status_update', {
-                        'pico_connected': False,
-                        'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-                        'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-                    })
+                    monitor_pico() # Returns when the link drops
+                finally:
+                    pico_sensors_running.clear()
             else:
-                logger.error("Failed to check or copy all_sensors.py to Pico")
+                logger.error("Failed to set up all_sensors.py on Pico")
                 pico_connected = False
-                socketio.emit('status_update', {
-                    'pico_connected': False,
-                    'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-                    'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-                })
+                pico_link.close()
+                socketio.emit('status_update', get_status_payload())
+                time.sleep(reconnection_interval)
         else:
-            logger.warning(f"No Pico detected. Will retry in {reconnection_interval} seconds...")
-        
-        # Sleep before next connection check
-        time.sleep(reconnection_interval)
+            logger.warning(f"Could not connect to Pico. Will retry in {reconnection_interval} seconds...")
+            time.sleep(reconnection_interval)
 
 # Route handlers for different pages
 @app.route('/')
@@ -577,22 +621,185 @@ def users():
     """Serve the users page"""
     return render_template('users.html')
 
+def get_log_filters():
+    """Read the status/method/from/to/search log filters from the query string."""
+    filters = {
+        'status': request.args.get('status'),
+        'method': request.args.get('method'),
+        'start': request.args.get('from'),
+        'end': request.args.get('to'),
+        'search': request.args.get('search'),
+    }
+    # A bare date as the upper bound means "through the end of that day"
+    if filters['end'] and len(filters['end']) == 10:
+        filters['end'] += 'T23:59:59.999999'
+    return filters
+
 @app.route('/api/logs')
 def get_logs():
-    """API endpoint to get authentication logs"""
-    return jsonify(auth_log_entries)
+    """API endpoint to get one page of authentication logs, newest first.
+
+    Query parameters (all optional):
+        limit  - page size (default 100, max 1000)
+        before - the next_before cursor returned with the previous page
+        status, method - exact match filters
+        from, to - ISO timestamp or YYYY-MM-DD date range (inclusive)
+        search - substring match against user, location and details
+        since  - a cursor from a previous response; only the entries added and
+                 the IDs deleted after it are returned
+    """
+    filters = get_log_filters()
+
+    # Read the cursor first so nothing committed during the query is missed.
+    # It also versions the response: nothing changes until the cursor moves.
+    cursor = log_store.current_change()
+    version = f"logs-{cursor}"
+    unchanged = http_cache.not_modified(version, log_store.last_modified)
+    if unchanged:
+        return unchanged
+
+    since = request.args.get('since')
+    if since is not None:
+        # A bad cursor must not fall through to a full page the client would take for a delta
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({'status': 'error', 'message': f"Invalid since cursor: {request.args.get('since')}"}), 400
+        changes = log_store.changes_since(since, **filters)
+        if changes is None:
+            # Too far behind the change feed; the client should reload
+            return jsonify({'reset': True, 'cursor': log_store.current_change()})
+        return http_cache.versioned(jsonify(changes), version, log_store.last_modified)
+    try:
+        logs, next_before = log_store.query(
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            before=request.args.get('before'),
+            **filters
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    return http_cache.versioned(jsonify({
+        'logs': logs,
+        'next_before': next_before,
+        'total': log_store.count(**filters),
+        'cursor': cursor
+    }), version, log_store.last_modified)
+
+@app.route('/api/logs/export')
+def export_logs():
+    """API endpoint to stream the authentication history as a download.
+
+    Query parameters:
+        format - ndjson (default) or csv
+        gzip   - 1 to gzip-compress the download
+        plus the same status/method/from/to/search filters as /api/logs
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'status': 'error', 'message': "format must be 'ndjson' or 'csv'"}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    filters = get_log_filters()
+
+    def generate_lines():
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(ENTRY_COLUMNS)
+            for entry in log_store.iter_entries(**filters):
+                writer.writerow([entry.get(column, '') for column in ENTRY_COLUMNS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            for entry in log_store.iter_entries(**filters):
+                yield json.dumps(entry) + '\n'
+
+    def generate():
+        if not compress:
+            for line in generate_lines():
+                yield line.encode('utf-8')
+            return
+        # wbits=31 writes a gzip header and trailer
+        compressor = zlib.compressobj(wbits=31)
+        for line in generate_lines():
+            chunk = compressor.compress(line.encode('utf-8'))
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    filename = f"auth_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/api/stats')
+def get_stats():
+    """API endpoint for the dashboard statistics, served from the log rollups.
+
+    Query parameters:
+        days - how many days the per-day breakdown covers (default 7, max 365)
+    """
+    days = request.args.get('days', 7, type=int)
+    if not 1 <= days <= 365:
+        return jsonify({'status': 'error', 'message': 'days must be between 1 and 365'}), 400
+
+    # The per-day buckets also move at midnight
+    version = f"stats-{log_store.current_change()}-{datetime.now().date().isoformat()}"
+    unchanged = http_cache.not_modified(version)
+    if unchanged:
+        return unchanged
+    return http_cache.versioned(jsonify(log_store.stats(days=days)), version)
+
+@app.route('/api/logs', methods=['DELETE'])
+def delete_logs():
+    """API endpoint to delete many logs at once.
+
+    Accepts a JSON body with a list of IDs and/or filters, e.g.
+    {"ids": [...]} or {"older_than": "2025-03-01", "status": "failure", "method": "Touch Pattern"}
+    Archived entries matching the request are deleted too.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+    ids = data.get('ids')
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(log_id, str) for log_id in ids)):
+        return jsonify({'status': 'error', 'message': "'ids' must be a list of strings"}), 400
+    for key in ('older_than', 'status', 'method'):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            return jsonify({'status': 'error', 'message': f"'{key}' must be a string"}), 400
+
+    try:
+        deleted = log_store.delete_many(
+            ids=ids,
+            older_than=data.get('older_than'),
+            status=data.get('status'),
+            method=data.get('method')
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    logger.info(f"Deleted {len(deleted)} logs")
+    if deleted:
+        broadcast_logs_changed(log_store.current_change())
+    return jsonify({'status': 'success', 'deleted': deleted, 'message': f'{len(deleted)} logs deleted'})
 
 @app.route('/api/logs/<string:log_id>', methods=['DELETE'])
 def delete_log(log_id):
     """API endpoint to delete a specific log by its ID"""
-    global auth_log_entries
-    # Find the log with the given ID
-    log_to_delete = next((log for log in auth_log_entries if log['id'] == log_id), None)
-    if log_to_delete:
-        # Remove the log from the list
-        auth_log_entries = [log for log in auth_log_entries if log['id'] != log_id]
-        save_logs(auth_log_entries)
+    if log_store.delete(log_id):
         logger.info(f"Deleted log with ID {log_id}")
+        # Let open logs pages pick up the deletion through delta sync
+        broadcast_logs_changed(log_store.current_change())
         return jsonify({'status': 'success', 'message': f'Log with ID {log_id} deleted'}), 200
     else:
         return jsonify({'status': 'error', 'message': 'Log not found'}), 404
@@ -600,10 +807,18 @@ def delete_log(log_id):
 @app.route('/api/settings', methods=['GET', 'POST'])
 def handle_settings():
     """API endpoint to get or update settings"""
-    global settings, pico_connected
+    global pico_connected
 
     if request.method == 'GET':
-        return jsonify(settings)
+        # Every save rewrites the file, so its mtime versions the settings
+        try:
+            version = f"settings-{os.stat(SETTINGS_FILE_PATH).st_mtime_ns}"
+        except OSError:
+            version = "settings-default"
+        unchanged = http_cache.not_modified(version)
+        if unchanged:
+            return unchanged
+        return http_cache.versioned(jsonify(load_settings()), version)
     elif request.method == 'POST':
         try:
             updated_settings_data = request.json
@@ -611,20 +826,11 @@ def handle_settings():
                 logger.error("No JSON data received in settings update")
                 return jsonify({'status': 'error', 'message': 'No JSON data received'}), 400
 
-            # Make a copy of current settings and update it
-            # Ensure settings is a dict before copying
-            current_settings = settings.copy() if isinstance(settings, dict) else load_settings()
-            current_settings.update(updated_settings_data)
-            settings = current_settings # Update global settings variable
-            save_settings(settings) # Save updated settings to settings.json
-
-            # Track if we need to restart all_sensors based on changes
-            restart_all_sensors = False
-            if 'customPattern' in updated_settings_data or 'colorSequence' in updated_settings_data:
-                 # Check if the new pattern/sequence is different from the old one before triggering restart
-                 # This requires comparing updated_settings_data with the previous state of settings
-                 # For simplicity now, assume any change requires restart if Pico connected
-                 restart_all_sensors = True
+            # Merge the update into settings.json; only keys whose values differ count as changed
+            changed_keys = save_settings(updated_settings_data)
+
+            # Only touch the Pico if something it reads actually changed
+            restart_all_sensors = bool(changed_keys & PICO_SETTINGS_KEYS)
 
             pattern_updated_on_device = None # Initialize status
 
@@ -632,10 +838,11 @@ def handle_settings():
             if restart_all_sensors and pico_connected:
                 logger.info("Relevant settings changed, attempting to update Pico...")
                 try:
-                    # Pass the relevant settings directly or trigger an update mechanism
-                    # For now, just call update_sensor_pattern which restarts the script
-                    # In the future, update_sensor_pattern could take settings as an argument
-                    update_success = update_sensor_pattern()
+                    # Swap the pattern in place; restart the sensor program only if that fails
+                    update_success = reload_pico_settings(load_settings())
+                    if not update_success:
+                        logger.warning("Hot reload failed, restarting the sensor program on Pico...")
+                        update_success = update_sensor_pattern()
                     pattern_updated_on_device = update_success
                     if update_success:
                         logger.info("Successfully updated sensor pattern/sequence on Pico.")
@@ -650,6 +857,8 @@ def handle_settings():
             return jsonify({
                 'status': 'success',
                 'message': 'Settings saved successfully.',
+                'revision': settings_cache.revision,
+                'changed': sorted(changed_keys),
                 # Indicate whether the update attempt was made and its result
                 'pattern_updated_on_device': pattern_updated_on_device,
                 'pico_connected': pico_connected
@@ -686,9 +895,13 @@ def remove_face():
 #get lsit of approved faces 
 @app.route('/api/approved-faces')
 def get_approved_faces():
+    version = f"faces-{os.stat('camera/faces/imagelist.txt').st_mtime_ns}"
+    unchanged = http_cache.not_modified(version)
+    if unchanged:
+        return unchanged
     with open('camera/faces/imagelist.txt', 'r') as f:
         lines = [line.strip() for line in f if line.strip()]
-    return jsonify(lines)
+    return http_cache.versioned(jsonify(lines), version)
 
 # Allows browser to acces images
 @app.route('/camera/faces/<path:filename>')
@@ -862,217 +1075,36 @@ def upload_approved():
 #             ssh.close()
 
 def update_sensor_pattern():
-    """Update the sensor settings on the Pico by restarting the main script."""
-    global pico_connected
+    """Update the sensor settings on the Pico by restarting the main script.
 
+    This reboots the Pico and takes 10-40 seconds; reload_pico_settings() is
+    tried first and this is only the fallback. The Pico connection thread
+    copies the files and relaunches all_sensors.py once the Pico is back.
+    """
     if not pico_connected:
         logger.error("Pico is not connected. Cannot update sensors.")
         return False
 
-    # Path to the all_sensors.py file on the host machine
-    all_sensors_host_path = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), # Go up two levels from web_UI
-        "pico_sensors",
-        "all_sensors.py"
-    )
-
-    # Path to the settings file on the host machine
-    settings_host_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SETTINGS_FILE_PATH)
-
-
     try:
-        # Perform a complete reboot of the Pico
-        logger.info("Performing complete reboot of the Pico to apply new settings...")
-
-        # Attempt clean reset first
-        try:
-            subprocess.run(
-                ["mpremote", "reset", "--hard"], # Use hard reset directly
-                capture_output=True,
-                text=True,
-                timeout=5 # Increased timeout for reset
-            )
-            logger.info("Pico hard reset command issued.")
-        except subprocess.TimeoutExpired:
-             logger.warning("mpremote reset command timed out, Pico might be resetting.")
-        except Exception as e:
-            logger.warning(f"Error during mpremote reset: {e}")
-
-        # Wait for Pico to potentially reboot and reconnect
-        logger.info("Waiting for Pico to reconnect after reset (up to 30s)...")
-        reconnect_attempts = 0
-        max_attempts = 15 # 15 attempts * 2s sleep = 30s
-        reconnected = False
-
-        while reconnect_attempts < max_attempts:
-            time.sleep(2) # Wait before checking connection
-            reconnect_attempts += 1
-            logger.info(f"Reconnection attempt {reconnect_attempts}/{max_attempts}...")
-
-            # Check if Pico is listed
-            result = subprocess.run(
-                ["mpremote", "connect", "list"],
-                capture_output=True,
-                text=True
-            )
-
-            if "2e8a:0005" in result.stdout: # Pico vendor/product ID
-                logger.info("Pico reconnected successfully.")
-                reconnected = True
-                # Allow extra time for filesystem to stabilize after reconnect
-                time.sleep(4)
-                break # Exit loop once reconnected
-            else:
-                logger.warning("Pico not yet detected, waiting...")
-
-        if not reconnected:
-            logger.error("Failed to reconnect to Pico after reset.")
-            pico_connected = False # Update connection status
-            socketio.emit('status_update', {'pico_connected': False}) # Notify clients
-            return False
-
-        # Update global connection status if it changed
-        if not pico_connected:
-             pico_connected = True
-             socketio.emit('status_update', {'pico_connected': True})
-
-
-        # Clear out any auto-start scripts (optional, but good practice)
+        # Clear out any auto-start scripts so the Pico comes back to an idle REPL
         logger.info("Ensuring no auto-start scripts (boot.py, main.py) are present...")
-        try:
-            subprocess.run(["mpremote", "rm", ":boot.py"], capture_output=True, text=True, timeout=3)
-        except: pass # Ignore errors if files don't exist
-        try:
-            subprocess.run(["mpremote", "rm", ":main.py"], capture_output=True, text=True, timeout=3)
-        except: pass
-
-
-        # Copy the main sensor script
-        if os.path.exists(all_sensors_host_path):
-            logger.info("Copying fresh all_sensors.py to Pico...")
-            try:
-                # Remove existing file first to ensure clean copy
-                subprocess.run(["mpremote", "rm", ":all_sensors.py"], capture_output=True, text=True, timeout=3)
-                time.sleep(0.5) # Short pause after delete
-
-                # Copy the file
-                copy_result = subprocess.run(
-                    ["mpremote", "cp", all_sensors_host_path, ":all_sensors.py"],
-                    capture_output=True, text=True, check=True, timeout=10 # Increased timeout for copy
-                )
-                logger.info("Successfully copied all_sensors.py to Pico.")
-            except subprocess.CalledProcessError as e:
-                 logger.error(f"Failed to copy all_sensors.py: {e.stderr}")
-                 return False
-            except subprocess.TimeoutExpired:
-                 logger.error("Timeout expired while copying all_sensors.py.")
-                 return False
-            except Exception as e:
-                logger.error(f"Failed to copy all_sensors.py: {e}")
-                return False
-        else:
-            logger.error(f"Cannot find source file at {all_sensors_host_path}")
-            return False
-
-        # Copy the settings file
-        if os.path.exists(settings_host_path):
-            logger.info(f"Copying {SETTINGS_FILE_PATH} to Pico...")
-            try:
-                # Remove existing file first
-                subprocess.run(["mpremote", "rm", f":{SETTINGS_FILE_PATH}"], capture_output=True, text=True, timeout=3)
-                time.sleep(0.5)
-
-                # Copy the file
-                copy_result = subprocess.run(
-                    ["mpremote", "cp", settings_host_path, f":{SETTINGS_FILE_PATH}"],
-                    capture_output=True, text=True, check=True, timeout=10
-                )
-                logger.info(f"Successfully copied {SETTINGS_FILE_PATH} to Pico.")
-            except subprocess.CalledProcessError as e:
-                 logger.error(f"Failed to copy {SETTINGS_FILE_PATH}: {e.stderr}")
-                 return False
-            except subprocess.TimeoutExpired:
-                 logger.error(f"Timeout expired while copying {SETTINGS_FILE_PATH}.")
-                 return False
-            except Exception as e:
-                logger.error(f"Failed to copy {SETTINGS_FILE_PATH}: {e}")
-                return False
-        else:
-             logger.warning(f"Settings file not found at {settings_host_path}. Pico might use defaults or fail.")
-
-
-        # Wait briefly for file system operations to complete
-        time.sleep(1)
-
-        # Start all_sensors.py using a launcher script to ensure clean execution
-        logger.info("Starting all_sensors.py on Pico with new settings...")
-        launcher_script = (
-            f'import gc, sys, _thread\n'
-            f'gc.collect()\n'
-            f'# Clear modules except essential ones\n'
-            f'for name in list(sys.modules):\n'
-            f'    if name not in ("gc", "sys", "_thread", "micropython", "uctypes", "array", "rp2"):\n' # Keep essential builtins
-            f'        try:\n'
-            f'            del sys.modules[name]\n'
-            f'        except KeyError:\n'
-            f'            pass\n'
-            f'gc.collect()\n'
-            f'def run_main():\n'
-            f'    try:\n'
-            f'        print("Importing all_sensors...")\n'
-            f'        all_sensors = __import__("all_sensors")\n'
-            f'        print("Running all_sensors.main()...")\n'
-            f'        all_sensors.main()\n' # Assuming all_sensors.py has a main() function
-            f'        print("all_sensors.main() finished.")\n'
-            f'    except Exception as e:\n'
-            f'        print(f"Error in run_main: {{e}}")\n'
-            f'try:\n'
-            f'    print("Starting thread for run_main...")\n'
-            f'    _thread.start_new_thread(run_main, ())\n'
-            f'    print("Thread started.")\n'
-            f'except Exception as e:\n'
-            f'    print(f"Error starting thread: {{e}}")\n'
-        )
-
-        try:
-            # Execute the launcher script using mpremote exec
-            result = subprocess.run(
-                ["mpremote", "exec", launcher_script],
-                capture_output=True,
-                text=True,
-                timeout=5 # Timeout for starting the script
-            )
-            logger.info(f"Launcher script stdout:\n{result.stdout}")
-            logger.error(f"Launcher script stderr:\n{result.stderr}")
-
-            # Check for success indicators in the output
-            if "Thread started." in result.stdout and not result.stderr:
-                logger.info("Successfully started all_sensors.py via launcher script.")
-                # Start monitoring the output in the existing monitor_pico thread
-                # No need to start a new monitor here, the main loop handles it.
-                return True
-            else:
-                logger.error(f"Failed to start all_sensors.py cleanly. Check Pico logs if possible. Output: {result.stdout} {result.stderr}")
-                return False
-        except subprocess.TimeoutExpired:
-            logger.error("Timeout expired while executing launcher script on Pico.")
-            return False
-        except Exception as e:
-            logger.error(f"Error executing launcher script on Pico: {e}")
-            return False
-
-    except Exception as e:
-        logger.error(f"Unexpected error during sensor update process: {e}")
-        # Attempt to ensure connection status is accurate
-        try:
-             result = subprocess.run(["mpremote", "connect", "list"], capture_output=True, text=True, timeout=3)
-             if "2e8a:0005" not in result.stdout:
-                  pico_connected = False
-                  socketio.emit('status_update', {'pico_connected': False})
-        except:
-             pico_connected = False # Assume disconnected on error
-             socketio.emit('status_update', {'pico_connected': False})
+        pico_link.remove("boot.py")
+        pico_link.remove("main.py")
+    except PicoLinkError as e:
+        logger.warning(f"Error removing auto-start scripts: {e}")
+
+    # Perform a complete reboot of the Pico
+    logger.info("Performing complete reboot of the Pico to apply new settings...")
+    pico_sensors_running.clear()
+    pico_link.reset()
+
+    # The monitor sees the link drop and the connection thread sets the Pico up again
+    logger.info(f"Waiting for Pico to restart with new settings (up to {PICO_RESTART_TIMEOUT}s)...")
+    if not pico_sensors_running.wait(PICO_RESTART_TIMEOUT):
+        logger.error("Pico did not restart all_sensors.py after reset.")
         return False
+    logger.info("Pico restarted with new settings.")
+    return True
 
 def update_audio():
     return None
@@ -1101,16 +1133,23 @@ def send_to_listener(message):
 def handle_connect():
     """Handle WebSocket connection"""
     logger.info("Client connected to WebSocket")
-    emit('status_update', {
-        'pico_connected': pico_connected,
-        'auth_success_count': sum(1 for log in auth_log_entries if log['status'] == 'success'),
-        'auth_failure_count': sum(1 for log in auth_log_entries if log['status'] == 'failure')
-    })
+    emit('status_update', get_status_payload())
 
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
+@app.route('/api/pico/stats')
+def get_pico_stats():
+    """API endpoint reporting the Pico event stream's queue and coalescing counters"""
+    stats = dict(pico_event_stats)
+    stats['pico_connected'] = pico_connected
+    stats['rotary_update_hz'] = ROTARY_UPDATE_HZ
+    link = pico_link
+    if link is not None:
+        stats.update(link.stats())
+    return jsonify(stats)
+
 @app.route('/api/sensor_mode')
 def get_sensor_mode():
     """API endpoint to get the current sensor mode"""
@@ -1120,8 +1159,18 @@ def get_sensor_mode():
 if __name__ == '__main__':
     # Start the Pico connection in a separate thread
     logger.info("Starting MFA Lock Web Server")
+
+    # Persist auth events from a background writer; drain it on shutdown
+    log_store.start_writer(flush_interval=LOG_FLUSH_INTERVAL)
+    atexit.register(log_store.close)
+    
+    atexit.register(close_pico_link)
+    # systemd and docker stop the server with SIGTERM, which skips atexit
+    # unless it is turned into a normal exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
-    # Launch Pico connection thread
+    # Watch for the Pico being plugged in, then launch the Pico connection thread
+    pico_watcher.start()
     pico_thread = threading.Thread(target=pico_connection_thread, daemon=True)
     pico_thread.start()
     